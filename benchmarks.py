@@ -0,0 +1,685 @@
+"""
+Benchmarks for the data and analytics layer.
+Run from the repository root so the data/ files resolve, e.g.
+
+	python3 benchmarks.py graph_build
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+import centrality
+import charts
+import config
+import csr
+import helpers
+import layouts
+import paths
+import query
+
+
+def _best_time(func: Callable, repeat:int = 3) -> float:
+	"""
+	Returns the best wall-clock time in seconds out of `repeat` runs.
+	"""
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func()
+		timings.append(time.perf_counter() - start)
+	return min(timings)
+
+def synthetic_frames(scale:int, node_df:pd.DataFrame = None, edge_df:pd.DataFrame = None, rewire:float = 0.1, seed:int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+	"""
+	Returns node and edge frames `scale` times the size of the dataset.
+	------------------
+	The dataset is tiled `scale` times with shifted ids, then a `rewire` fraction of the edges
+	is pointed at random nodes so the copies are connected to each other.
+	"""
+	node_df = charts.get_node_df() if node_df is None else node_df
+	edge_df = charts.get_edge_df() if edge_df is None else edge_df
+	rng = np.random.RandomState(seed)
+
+	id_offset = int(node_df['id'].max()) + 1
+	node_frames = []
+	edge_frames = []
+	for copy_idx in range(scale):
+		nodes = node_df.copy()
+		nodes['id'] = nodes['id'] + copy_idx * id_offset
+		node_frames.append(nodes)
+
+		edges = edge_df.copy()
+		edges['source'] = edges['source'] + copy_idx * id_offset
+		edges['target'] = edges['target'] + copy_idx * id_offset
+		edge_frames.append(edges)
+
+	nodes = pd.concat(node_frames, ignore_index=True)
+	edges = pd.concat(edge_frames, ignore_index=True)
+
+	rewired = rng.rand(len(edges)) < rewire
+	edges.loc[rewired, 'target'] = rng.choice(nodes['id'].values, rewired.sum())
+	edges = edges[edges['source'] != edges['target']]
+
+	return nodes, edges
+
+def _iterrows_graph(node_df:pd.DataFrame, edge_df:pd.DataFrame) -> nx.Graph:
+	"""
+	Row-by-row construction that generate_graph used before the bulk path, kept as the baseline.
+	"""
+	G = nx.Graph()
+	for _, row in node_df.iterrows():
+		G.add_node(row['id'], **{column: row[column] for column in charts.NODE_ATTRIBUTES})
+	for _, row in edge_df.iterrows():
+		G.add_edge(row['source'], row['target'], weight=row['weight'])
+	return G
+
+def _same_graph(G:nx.Graph, H:nx.Graph) -> bool:
+	return dict(G.nodes(data=True)) == dict(H.nodes(data=True)) and \
+		{frozenset((u, v)): d for u, v, d in G.edges(data=True)} == {frozenset((u, v)): d for u, v, d in H.edges(data=True)}
+
+def bench_graph_build(args):
+	"""
+	Graph construction time on the dataset and on synthetic graphs 10x and 100x larger.
+	"""
+	print(f"{'scale':>6} {'nodes':>10} {'edges':>10} {'bulk (s)':>10} {'iterrows (s)':>13}")
+	for scale in (1, 10, 100):
+		node_df, edge_df = synthetic_frames(scale) if scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+		bulk = _best_time(lambda: charts._graph_from_frames(node_df, edge_df), args.repeat)
+
+		iterrows = float('nan')
+		if scale <= args.max_legacy_scale:
+			iterrows = _best_time(lambda: _iterrows_graph(node_df, edge_df), 1)
+			assert _same_graph(charts._graph_from_frames(node_df, edge_df), _iterrows_graph(node_df, edge_df))
+
+		print(f"{scale:>6} {len(node_df):>10} {len(edge_df):>10} {bulk:>10.4f} {iterrows:>13.4f}")
+
+def _with_random_attributes(G:nx.Graph, seed:int = 0) -> nx.Graph:
+	"""
+	Copy of G with random book attributes and co-purchase weights, for graphs that don't come from the dataset.
+	"""
+	rng = np.random.RandomState(seed)
+	G = nx.Graph(G)
+	for node in G:
+		G.nodes[node].update(price = rng.uniform(1, 60), avg_rating = int(rng.randint(1, 6)), num_reviews = int(rng.randint(0, 2000)))
+	for source, target in G.edges():
+		G[source][target]['weight'] = int(rng.randint(1, 20))
+	return G
+
+def _two_pass_cliques(G:nx.Graph):
+	"""
+	Clique grouping as get_cliques_by_size did it before the index: one enumeration for the cliques, one for their sizes.
+	"""
+	maximal_cliques = list(nx.find_cliques(G))
+	maximal_clique_sizes = [len(clique) for clique in nx.find_cliques(G)]
+	cliques_by_size = {}
+	for clique, size in zip(maximal_cliques, maximal_clique_sizes):
+		cliques_by_size.setdefault(size, []).append(clique)
+	return cliques_by_size
+
+def bench_clique_index(args):
+	"""
+	Clique enumeration on the dataset and on relaxed caveman graphs with heavy clique structure:
+	the old two-pass grouping, building the index once, lookups against the built index,
+	and clique metrics for every size (which should grow linearly with total clique membership).
+	"""
+	graphs = [('dataset', charts._graph_from_frames(charts.get_node_df(), charts.get_edge_df()))]
+	for cave_size in (8, 16, 24):
+		graphs.append((f"caveman {cave_size}", nx.relaxed_caveman_graph(2000 // cave_size, cave_size, 0.1, seed = 0)))
+
+	print(f"{'graph':>12} {'nodes':>7} {'edges':>8} {'cliques':>8} {'membership':>11} {'two-pass (s)':>13} {'index (s)':>10} {'lookup (us)':>12} {'metrics (s)':>12}")
+	for name, G in graphs:
+		G = nx.freeze(G)
+		two_pass = _best_time(lambda: _two_pass_cliques(G), args.repeat)
+
+		def build_index():
+			charts._CLIQUE_INDEXES.pop(G, None)
+			return charts.get_clique_index(G)
+		index = _best_time(build_index, args.repeat)
+
+		clique_index = charts.get_clique_index(G)
+		sizes = list(clique_index)
+		lookup = _best_time(lambda: [charts.get_clique_index(G).get(size) for size in sizes], args.repeat) / max(len(sizes), 1)
+		n_cliques = sum(len(cliques) for cliques in clique_index.values())
+		membership = sum(cliques.size for cliques in clique_index.values())
+
+		if 'price' not in G.nodes[next(iter(G))]:
+			G = nx.freeze(_with_random_attributes(G))
+			charts.get_clique_index(G)
+		metrics = _best_time(lambda: [charts.generate_clique_metrics(G, size) for size in sizes], args.repeat)
+
+		print(f"{name:>12} {len(G):>7} {G.number_of_edges():>8} {n_cliques:>8} {membership:>11} {two_pass:>13.4f} {index:>10.4f} {lookup * 1e6:>12.2f} {metrics:>12.4f}")
+
+def bench_graph_figure(args):
+	"""
+	plot_graph figure build time and serialised payload size against edge count for every edge mode.
+	The layout is a fixed random one so only the figure is timed.
+	"""
+	print(f"{'scale':>6} {'edges':>8} {'mode':>9} {'traces':>7} {'build (s)':>10} {'payload (MB)':>13}")
+	for scale in (1, 10, 100):
+		node_df, edge_df = synthetic_frames(scale) if scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+		G = charts._compute_adjacencies(charts._graph_from_frames(node_df, edge_df))
+		pos = nx.random_layout(G, seed = 0)
+		for edge_mode in charts.EDGE_MODES:
+			if edge_mode == 'per_edge' and scale > args.max_legacy_scale:
+				continue
+			build = _best_time(lambda: charts._graph_figure(G, pos, edge_mode), args.repeat)
+			fig = charts._graph_figure(G, pos, edge_mode)
+			payload = len(fig.to_json()) / 1e6
+			print(f"{scale:>6} {G.number_of_edges():>8} {edge_mode:>9} {len(fig.data):>7} {build:>10.4f} {payload:>13.2f}")
+
+def bench_layout_cache(args):
+	"""
+	Layout time for the graph and for genre-filtered subgraphs of it: computed from scratch,
+	served from the layout cache, and warm-started from the cached layout of the whole graph.
+	"""
+	node_df, edge_df = synthetic_frames(args.scale) if args.scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+	G = nx.freeze(charts._graph_from_frames(node_df, edge_df))
+	genres = sorted(node_df['genre'].unique())
+	graphs = [('all', G)]
+	for n_genres in (len(genres) - 1, len(genres) // 2):
+		selected = set(genres[:n_genres])
+		graphs.append((f"{n_genres} genres", nx.freeze(nx.Graph(G.subgraph(node for node, genre in G.nodes(data = 'genre') if genre in selected)))))
+
+	print(f"{'layout':>13} {'graph':>9} {'nodes':>7} {'cold (s)':>9} {'cached (ms)':>12} {'warm start (s)':>15}")
+	for name in ('spring', 'kamada-kawai'):
+		for graph_name, H in graphs:
+			def cold():
+				layouts.LAYOUT_CACHE.clear()
+				layouts.compute_layout(H, name)
+			def warm():
+				layouts.LAYOUT_CACHE.clear()
+				layouts.compute_layout(G, name)
+				start = time.perf_counter()
+				layouts.compute_layout(H, name, warm_start = G)
+				return time.perf_counter() - start
+			try:
+				cold_time = _best_time(cold, args.repeat)
+			except ImportError as error:
+				print(f"{name:>13} skipped: {error}")
+				break
+			cached = _best_time(lambda: layouts.compute_layout(H, name), args.repeat)
+			warm_time = min(warm() for _ in range(args.repeat)) if H is not G else float('nan')
+			print(f"{name:>13} {graph_name:>9} {len(H):>7} {cold_time:>9.4f} {cached * 1e3:>12.3f} {warm_time:>15.4f}")
+
+def _with_random_centrality(scale:int, seed:int = 0) -> nx.Graph:
+	"""
+	Frozen graph `scale` times the size of the dataset with random centrality values,
+	for benchmarks that only draw the graph and would otherwise wait on exact closeness.
+	"""
+	rng = np.random.RandomState(seed)
+	node_df, edge_df = synthetic_frames(scale) if scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+	G = charts._graph_from_frames(node_df, edge_df)
+	values = pd.DataFrame(rng.rand(len(G), len(centrality.CENTRALITY_COLUMNS)), index = list(G.nodes()), columns = centrality.CENTRALITY_COLUMNS)
+	return nx.freeze(charts._compute_centrality_measures(G, values))
+
+def _legacy_cyto_elements(G:nx.Graph):
+	"""
+	Per-node and per-edge comprehension the plot_cyto_* functions used before cyto_elements, kept as the baseline.
+	"""
+	elements = [{'data': {
+					'id': str(int(node_id)),
+					'label': str(int(node_id)),
+					'genre' : int(G.nodes[node_id]['genre']),
+					'sales_rank' : int(G.nodes[node_id]['sales_rank']),
+					'avg_rating' : float(G.nodes[node_id]['avg_rating']),
+					'num_reviews' : int(G.nodes[node_id]['num_reviews']),
+					'num_pages' : int(G.nodes[node_id]['num_pages']),
+					'price' : float(G.nodes[node_id]['price']),
+					'degree_centrality': float(G.nodes[node_id]['degree_centrality']),
+					'betweenness_centrality': float(G.nodes[node_id]['betweenness_centrality']),
+					'closeness_centrality': float(G.nodes[node_id]['closeness_centrality']),
+					}
+				} for node_id in G.nodes()]
+	edges = [{'data' : {'source' : str(int(source)), 'target' : str(int(target)), 'weight' : np.log(weight)}} for source, target, weight in G.edges.data("weight")]
+	return elements + edges
+
+def bench_cyto_elements(args):
+	"""
+	Cytoscape element build time and serialised size: the legacy comprehension against cyto_elements
+	at several float precisions, and the three ego panels built together.
+	"""
+	print(f"{'scale':>6} {'elements':>9} {'builder':>10} {'precision':>10} {'build (s)':>10} {'payload (MB)':>13}")
+	for scale in (1, 10, 100):
+		G = _with_random_centrality(scale)
+		runs = [('legacy', None, lambda: _legacy_cyto_elements(G))]
+		runs += [('vectorised', precision, lambda precision = precision: charts.cyto_elements(G, precision = precision)) for precision in (17, 6, 3)]
+		for builder, precision, build in runs:
+			elapsed = _best_time(build, args.repeat)
+			elements = build()
+			payload = len(json.dumps(elements, default = float)) / 1e6
+			print(f"{scale:>6} {len(elements):>9} {builder:>10} {str(precision or '-'):>10} {elapsed:>10.4f} {payload:>13.3f}")
+
+		ego = _best_time(lambda: charts.plot_cyto_ego_graphs(G), args.repeat)
+		ego_payload = len(json.dumps(charts.plot_cyto_ego_graphs(G))) / 1e6
+		print(f"{scale:>6} {'':>9} {'ego panels':>10} {config.CYTO_FLOAT_PRECISION:>10} {ego:>10.4f} {ego_payload:>13.3f}")
+
+def bench_cyto_detail(args):
+	"""
+	Overall Cytoscape payload and build time with and without a level-of-detail node limit,
+	on the dataset and on synthetic graphs 10x and 100x larger.
+	Centrality is drawn at random since only the ranking matters here.
+	"""
+	print(f"{'scale':>6} {'nodes':>8} {'limit':>6} {'elements':>9} {'build (s)':>10} {'payload (MB)':>13}")
+	for scale in (1, 10, 100):
+		G = _with_random_centrality(scale)
+		for limit in (0,) + tuple(helpers.detail_limits()[1:]):
+			build = _best_time(lambda: charts.plot_cyto_graph(G, detail_limit = limit), args.repeat)
+			elements = charts.plot_cyto_graph(G, detail_limit = limit)
+			payload = len(json.dumps(elements)) / 1e6
+			print(f"{scale:>6} {len(G):>8} {limit:>6} {len(elements):>9} {build:>10.4f} {payload:>13.3f}")
+
+# Operators of the clauses _split_filter_part recognises, the first spelling of each is the one it returns
+_FILTER_OPERATORS = [
+	['ge ', '>='],
+	['le ', '<='],
+	['lt ', '<'],
+	['gt ', '>'],
+	['ne ', '!='],
+	['eq ', '='],
+	['contains '],
+	['datestartswith ']
+]
+
+def _split_filter_part(filter_part):
+	"""
+	Column, operator and value of one clause, as the stats table parsed them before query.compile_filter.
+	"""
+	for operator_type in _FILTER_OPERATORS:
+		for operator in operator_type:
+			if operator in filter_part:
+				name_part, value_part = filter_part.split(operator, 1)
+				name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+				value_part = value_part.strip()
+				v0 = value_part[0]
+				if (v0 == value_part[-1] and v0 in ("'", '"', '`')):
+					value = value_part[1: -1].replace('\\' + v0, v0)
+				else:
+					try:
+						value = float(value_part)
+					except ValueError:
+						value = value_part
+
+				return name, operator_type[0].strip(), value
+
+	return [None] * 3
+
+def _mask_filter(filter:str, dff:pd.DataFrame) -> pd.DataFrame:
+	"""
+	Clause-by-clause boolean masks, as filter_stats_table did before the query indexes, kept as the baseline.
+	"""
+	for filter_part in filter.split(' && '):
+		col_name, operator, filter_value = _split_filter_part(filter_part)
+		if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+			dff = dff.loc[getattr(dff[col_name], operator)(filter_value)]
+		elif operator == 'contains':
+			dff = dff.loc[dff[col_name].str.contains(filter_value)]
+		elif operator == 'datestartswith':
+			dff = dff.loc[dff[col_name].str.startswith(filter_value)]
+	return dff
+
+_QUERY_FILTERS = [
+	'{price} ge 20 && {genre} eq 2',
+	'{sales_rank} lt 50000 && {avg_rating} ge 4 && {num_pages} gt 300',
+	'{num_reviews} ge 1000',
+	'{genre} ne 1 && {price} le 15 && {id} gt 100'
+]
+
+def bench_query_index(args):
+	"""
+	Stats table filtering on the dataset and on node tables 10x and 100x larger:
+	clause-by-clause masks against the query indexes, uncached and from the filter LRU.
+	"""
+	print(f"{'scale':>6} {'rows':>9} {'index build (s)':>16} {'filter':>64} {'matches':>8} {'masks (ms)':>11} {'index (ms)':>11} {'cached (ms)':>12}")
+	for scale in (1, 10, 100):
+		node_df = synthetic_frames(scale)[0].reset_index(drop = True) if scale > 1 else charts.get_node_df()
+		build = _best_time(lambda: query.TableIndex(node_df), args.repeat)
+		uncached = query.TableIndex(node_df, cache_size = 0)
+		cached = query.TableIndex(node_df)
+		for filter in _QUERY_FILTERS:
+			masks = _best_time(lambda: _mask_filter(filter, node_df), args.repeat)
+			indexed = _best_time(lambda: uncached.filter(filter), args.repeat)
+			cached.filter(filter)
+			hit = _best_time(lambda: cached.filter(filter), args.repeat)
+			assert _mask_filter(filter, node_df).equals(uncached.filter(filter))
+			print(f"{scale:>6} {len(node_df):>9} {build:>16.4f} {filter:>64} {len(cached.positions(filter)):>8} {masks * 1e3:>11.3f} {indexed * 1e3:>11.3f} {hit * 1e3:>12.3f}")
+
+_COMPILE_FILTERS = [
+	'{price} ge 20 && {genre} eq 2',
+	'{sales_rank} lt 50000 && {avg_rating} ge 4 && {num_pages} gt 300',
+	'({genre} eq 1 || {genre} eq 3) && {price} < 25',
+	'({num_reviews} >= 1000 && {avg_rating} >= 4) || ({price} <= 10 && {num_pages} > 400)'
+]
+
+def bench_filter_compile(args):
+	"""
+	Parse plus evaluate over the node table: _split_filter_part and masks (&& only) against compiled
+	predicates, compiled cold or taken from the memo, evaluated as masks or through the query indexes.
+	"""
+	print(f"{'scale':>6} {'rows':>8} {'filter':>86} {'split (ms)':>11} {'compile (us)':>13} {'memo (us)':>10} {'mask (ms)':>10} {'index (ms)':>11}")
+	for scale in (1, 10, 100):
+		node_df = synthetic_frames(scale)[0].reset_index(drop = True) if scale > 1 else charts.get_node_df()
+		index = query.TableIndex(node_df, cache_size = 0)
+		for filter in _COMPILE_FILTERS:
+			split = _best_time(lambda: _mask_filter(filter, node_df), args.repeat) if '||' not in filter and '(' not in filter else float('nan')
+			def compile_cold():
+				query._COMPILED.clear()
+				return query.compile_filter(filter)
+			compile_time = _best_time(compile_cold, args.repeat)
+			memo = _best_time(lambda: query.compile_filter(filter), args.repeat)
+			predicate = query.compile_filter(filter)
+			mask = _best_time(lambda: node_df[predicate.mask(node_df)], args.repeat)
+			indexed = _best_time(lambda: index.filter(filter), args.repeat)
+			assert node_df[predicate.mask(node_df)].equals(index.filter(filter))
+			print(f"{scale:>6} {len(node_df):>8} {filter:>86} {split * 1e3:>11.3f} {compile_time * 1e6:>13.1f} {memo * 1e6:>10.1f} {mask * 1e3:>10.3f} {indexed * 1e3:>11.3f}")
+
+_PANEL_FILTERS = {
+	'full': {'page_filter': [0, 10], 'price_filter': [0, 10]},
+	'genre': {'genre_filter': [1, 2], 'page_filter': [2, 8], 'price_filter': [1, 9]},
+	'rating': {'rating_filter': [3, 4], 'page_filter': [0, 10], 'price_filter': [0, 10]}
+}
+
+def bench_clique_panel(args):
+	"""
+	Clique panel latency once the filtered graph is built: rebuilding the clique nodes' graph
+	through generate_graph against drawing an induced view of the filtered graph.
+	"""
+	print(f"{'filters':>8} {'scope':>9} {'elements':>9} {'rebuild (s)':>12} {'view (s)':>9} {'speedup':>8}")
+	for name, filters in _PANEL_FILTERS.items():
+		for scope in ('global', 'subgraph'):
+			params = dict(filters, nclique_filter = 1, centrality_scope = scope)
+			timings = {}
+			for subgraph_view in (False, True):
+				def draw():
+					charts.GRAPH_CACHE.clear()
+					# The filtered graph is shared with the other panels, build it outside the timing
+					charts._graph_from_params(params)
+					start = time.perf_counter()
+					elements = charts.plot_cyto_nclique_graph(params = dict(params), subgraph_view = subgraph_view)
+					return time.perf_counter() - start, elements
+				runs = [draw() for _ in range(args.repeat)]
+				timings[subgraph_view] = min(elapsed for elapsed, _ in runs)
+				elements = runs[0][1]
+			print(f"{name:>8} {scope:>9} {len(elements):>9} {timings[False]:>12.4f} {timings[True]:>9.4f} {timings[False] / timings[True]:>8.2f}")
+
+def bench_centrality_sampling(args):
+	"""
+	Accuracy and latency of sampled and adaptive betweenness and closeness against the exact values.
+	"""
+	node_df, edge_df = synthetic_frames(args.scale) if args.scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+	G = charts._graph_from_frames(node_df, edge_df)
+	print(f"{len(G)} nodes, {G.number_of_edges()} edges")
+
+	exact = centrality.compute_centrality(G, mode = 'exact')
+	exact_betweenness = exact['betweenness_centrality']
+	exact_closeness = exact['closeness_centrality']
+	print(f"{'mode':>10} {'pivots':>8} {'time (s)':>9} {'spearman':>9} {'max abs err':>12} {'max est err':>12} {'closeness err':>14} {'closeness est':>14}")
+	print(f"{'exact':>10} {len(G):>8} {exact.attrs['centrality']['elapsed']:>9.3f} {1:>9.4f} {0:>12.2e} {0:>12.2e} {0:>14.2e} {0:>14.2e}")
+
+	runs = [('sampled', {'samples': samples}) for samples in (16, 64, 256, 1024) if samples < len(G)]
+	runs += [('adaptive', {'time_budget': budget}) for budget in (0.1, 0.5, 2.0)]
+	for mode, options in runs:
+		approx = centrality.compute_centrality(G, mode = mode, **options)
+		summary = approx.attrs['centrality']
+		approx_betweenness = approx['betweenness_centrality']
+		# Spearman correlation as the Pearson correlation of the ranks
+		spearman = exact_betweenness.rank().corr(approx_betweenness.rank())
+		max_error = (exact_betweenness - approx_betweenness).abs().max()
+		closeness_error = (exact_closeness - approx['closeness_centrality']).abs().max()
+		print(f"{mode:>10} {summary['pivots']:>8} {summary['elapsed']:>9.3f} {spearman:>9.4f} {max_error:>12.2e} {summary['betweenness_error']:>12.2e} {closeness_error:>14.2e} {summary['closeness_error']:>14.2e}")
+
+def bench_centrality_parallel(args):
+	"""
+	Exact centrality time on the process pool from 1 to --workers processes, checked against the serial result.
+	"""
+	node_df, edge_df = synthetic_frames(args.scale) if args.scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+	G = charts._graph_from_frames(node_df, edge_df)
+	print(f"{len(G)} nodes, {G.number_of_edges()} edges")
+
+	serial = None
+	print(f"{'workers':>8} {'cold (s)':>9} {'warm (s)':>9} {'speedup':>8} {'max abs diff':>13}")
+	for workers in range(1, args.workers + 1):
+		start = time.perf_counter()
+		result = centrality.compute_centrality(G, mode = 'exact', workers = workers)
+		cold = time.perf_counter() - start
+		warm = _best_time(lambda: centrality.compute_centrality(G, mode = 'exact', workers = workers), args.repeat)
+		if serial is None:
+			serial, serial_time = result, warm
+		max_diff = (serial - result).abs().max().max()
+		print(f"{workers:>8} {cold:>9.3f} {warm:>9.3f} {serial_time / warm:>8.2f} {max_diff:>13.2e}")
+	centrality.shutdown_pool()
+
+def _load_synthetic_snapshot(scale:int) -> nx.Graph:
+	"""
+	Publishes synthetic frames `scale` times the dataset as the live snapshot and returns its full graph.
+	Degree and clustering are exact, betweenness and closeness random so the snapshot doesn't wait on exact closeness.
+	"""
+	rng = np.random.RandomState(0)
+	node_df, edge_df = synthetic_frames(scale) if scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+	G = charts._graph_from_frames(node_df, edge_df)
+	centrality_df = pd.DataFrame({
+		'degree_centrality': nx.degree_centrality(G),
+		'betweenness_centrality': dict(zip(G.nodes(), rng.rand(len(G)))),
+		'closeness_centrality': dict(zip(G.nodes(), rng.rand(len(G)))),
+		'clustering_coefficient': nx.clustering(G),
+		'betweenness_error': 0.0,
+		'closeness_error': 0.0
+	}, columns = centrality.CENTRALITY_COLUMNS)
+	centrality_df.index.name = 'id'
+	G = nx.freeze(charts._compute_adjacencies(charts._compute_centrality_measures(G, centrality_df)))
+	charts._swap_snapshot({'version': 0, 'node_df': node_df, 'edge_df': edge_df, 'centrality_df': centrality_df}, G)
+	print(f"{len(G)} nodes, {G.number_of_edges()} edges")
+	return G
+
+def bench_ingest(args):
+	"""
+	Applying appended rows with charts.ingest against rebuilding the graph and its degree and clustering from the frames.
+	"""
+	_load_synthetic_snapshot(args.scale)
+
+	rng = np.random.RandomState(0)
+	print(f"{'new nodes':>10} {'new edges':>10} {'ingest (s)':>11} {'rebuild (s)':>12} {'max diff':>9}")
+	for n_nodes, n_edges in ((1, 5), (10, 50), (100, 500)):
+		ids = charts.get_node_df()['id'].values
+		nodes = charts.get_node_df().sample(n_nodes, random_state = rng).copy()
+		nodes['id'] = int(ids.max()) + 1 + np.arange(n_nodes)
+		sources = np.concatenate((nodes['id'].values, rng.choice(ids, n_edges - n_nodes)))
+		edges = pd.DataFrame({'source': sources, 'target': rng.choice(ids, n_edges), 'weight': rng.randint(1, 10, n_edges)})
+		edges = edges[edges['source'] != edges['target']]
+
+		start = time.perf_counter()
+		charts.ingest(nodes, edges, recompute = False)
+		ingested = time.perf_counter() - start
+
+		start = time.perf_counter()
+		H = charts._graph_from_frames(charts.get_node_df(), charts.get_edge_df())
+		degree, clustering = nx.degree_centrality(H), nx.clustering(H)
+		rebuilt = time.perf_counter() - start
+
+		G = charts.generate_graph()
+		max_diff = max(max(abs(G.nodes[node]['degree_centrality'] - degree[node]), abs(G.nodes[node]['clustering_coefficient'] - clustering[node])) for node in G)
+		print(f"{n_nodes:>10} {len(edges):>10} {ingested:>11.3f} {rebuilt:>12.3f} {max_diff:>9.2e}")
+
+_FILTERED_GRAPH_FILTERS = {
+	'genre': {'genre_filter': [1]},
+	'ranks': {'sales_rank_filter': ['0 - 25000', '100000 - 200000'], 'reviews_filter': ['500 - 1000']},
+	'deciles': {'rating_filter': [4, 5], 'page_filter': [2, 8], 'price_filter': [1, 9]},
+	'genres': {'genre_filter': [1, 2, 3, 4]}
+}
+
+def bench_filtered_graph(args):
+	"""
+	Filtered graph latency with the full graph pinned: building a new graph from the filtered frames against a subgraph view of the full graph.
+	"""
+	_load_synthetic_snapshot(args.scale)
+	node_df, edge_df = charts.get_node_df(), charts.get_edge_df()
+
+	def copy(filters):
+		mask = charts._node_mask(node_df, filters)
+		keep_nodes = node_df['id'][mask]
+		G = charts._graph_from_frames(node_df[mask], edge_df[edge_df['source'].isin(keep_nodes) & edge_df['target'].isin(keep_nodes)])
+		return charts._compute_adjacencies(charts._compute_centrality_measures(G, charts.get_centrality_df()))
+
+	def view(filters):
+		charts.GRAPH_CACHE.clear()
+		return charts.generate_graph(filters = filters)
+
+	print(f"{'filters':>8} {'nodes':>8} {'edges':>8} {'copy (s)':>9} {'view (s)':>9} {'speedup':>8}")
+	for name, filters in _FILTERED_GRAPH_FILTERS.items():
+		G = view(filters)
+		assert list(G.nodes()) == list(copy(filters).nodes()) and G.number_of_edges() == copy(filters).number_of_edges()
+		copy_time = _best_time(lambda: copy(filters), args.repeat)
+		view_time = _best_time(lambda: view(filters), args.repeat)
+		print(f"{name:>8} {len(G):>8} {G.number_of_edges():>8} {copy_time:>9.4f} {view_time:>9.4f} {copy_time / view_time:>8.2f}")
+
+def _traced_bytes(build: Callable):
+	"""
+	Returns what build() returns together with the bytes it allocated and still holds.
+	"""
+	tracemalloc.start()
+	before = tracemalloc.take_snapshot()
+	result = build()
+	held = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, 'filename'))
+	tracemalloc.stop()
+	return result, held
+
+def bench_csr(args):
+	"""
+	Memory per edge and traversal speed of the CSR graph core against networkx, on the dataset and graphs 10x and 100x larger.
+	Exact centrality on the CSR graph is compared with networkx up to --max-legacy-scale.
+	"""
+	print(f"{'scale':>6} {'nodes':>8} {'edges':>8} {'measure':>12} {'networkx':>10} {'csr':>10} {'speedup':>8}")
+	for scale in (1, 10, 100):
+		node_df, edge_df = synthetic_frames(scale) if scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+		G, nx_bytes = _traced_bytes(lambda: charts._graph_from_frames(node_df, edge_df))
+		graph = csr.CSRGraph.from_frames(node_df, edge_df)
+		sources = node_df['id'].sample(10, random_state = 0).tolist()
+
+		def report(measure, nx_value, csr_value, unit = 's'):
+			ratio = nx_value / csr_value if csr_value else float('nan')
+			print(f"{scale:>6} {len(G):>8} {G.number_of_edges():>8} {measure:>12} {nx_value:>9.4g}{unit} {csr_value:>9.4g}{unit} {ratio:>8.2f}")
+
+		report('bytes/edge', nx_bytes / G.number_of_edges(), graph.nbytes / graph.number_of_edges(), 'B')
+		report('build', _best_time(lambda: charts._graph_from_frames(node_df, edge_df), args.repeat), _best_time(lambda: csr.CSRGraph.from_frames(node_df, edge_df), args.repeat))
+		report('bfs x10', _best_time(lambda: [nx.single_source_shortest_path_length(G, source) for source in sources], args.repeat), _best_time(lambda: [graph.bfs(source) for source in sources], args.repeat))
+		report('ego r2 x10', _best_time(lambda: [nx.ego_graph(G, source, 2) for source in sources], args.repeat), _best_time(lambda: [graph.ego(source, 2) for source in sources], args.repeat))
+		report('degree', _best_time(lambda: nx.degree_centrality(G), args.repeat), _best_time(graph.degree_centrality, args.repeat))
+		report('clustering', _best_time(lambda: nx.clustering(G), args.repeat), _best_time(graph.clustering, args.repeat))
+
+		clustering = nx.clustering(G)
+		assert np.allclose(graph.clustering(), [clustering[node] for node in graph.nodes.tolist()])
+		if scale <= args.max_legacy_scale:
+			start = time.perf_counter()
+			betweenness, closeness = nx.betweenness_centrality(G), nx.closeness_centrality(G)
+			nx_time = time.perf_counter() - start
+			csr_centrality = centrality.compute_centrality(graph, mode = 'exact', workers = 1)
+			assert np.allclose(csr_centrality['betweenness_centrality'], [betweenness[node] for node in graph.nodes.tolist()])
+			assert np.allclose(csr_centrality['closeness_centrality'], [closeness[node] for node in graph.nodes.tolist()])
+			report('centrality', nx_time, csr_centrality.attrs['centrality']['elapsed'])
+
+def bench_paths(args):
+	"""
+	Path queries of paths.PathService against networkx on the dataset and graphs 10x and 100x larger.
+	All-pairs nx.shortest_path(G), which metrics used to call, is only measured on the dataset.
+	"""
+	print(f"{'scale':>6} {'nodes':>8} {'query':>18} {'networkx':>10} {'service':>10} {'speedup':>8}")
+	for scale in (1, 10, 100):
+		node_df, edge_df = synthetic_frames(scale) if scale > 1 else (charts.get_node_df(), charts.get_edge_df())
+		G = charts._graph_from_frames(node_df, edge_df)
+		service = paths.PathService(csr.CSRGraph.from_frames(node_df, edge_df))
+		rng = np.random.RandomState(0)
+		pairs = [tuple(pair) for pair in rng.choice(node_df['id'].values, (100, 2)).tolist() if nx.has_path(G, *pair)]
+		source = pairs[0][0]
+
+		def report(query, nx_value, service_value, unit = 's'):
+			print(f"{scale:>6} {len(G):>8} {query:>18} {nx_value:>9.4g}{unit} {service_value:>9.4g}{unit} {nx_value / service_value:>8.2f}")
+
+		if scale == 1:
+			_, all_pairs_bytes = _traced_bytes(lambda: nx.shortest_path(G))
+			_, tree_bytes = _traced_bytes(lambda: service.source_tree(source))
+			report('all-pairs vs tree', all_pairs_bytes, tree_bytes, 'B')
+
+		report(f"{len(pairs)} pairs", _best_time(lambda: [nx.shortest_path(G, *pair) for pair in pairs], args.repeat), _best_time(lambda: [service.shortest_path(*pair) for pair in pairs], args.repeat))
+		report(f"{len(pairs)} pairs weighted", _best_time(lambda: [nx.bidirectional_dijkstra(G, *pair) for pair in pairs], args.repeat), _best_time(lambda: [service.shortest_path(*pair, weighted = True) for pair in pairs], args.repeat))
+		for u, v in pairs:
+			assert len(service.shortest_path(u, v)) == len(nx.shortest_path(G, u, v))
+
+		def stream():
+			service.trees.clear()
+			return sum(1 for _ in service.iter_paths(source))
+		report('single source', _best_time(lambda: nx.shortest_path(G, source), args.repeat), _best_time(stream, args.repeat))
+		service.source_tree(source)
+		report('cached tree pairs', _best_time(lambda: [nx.shortest_path(G, source, target) for _, target in pairs], args.repeat), _best_time(lambda: [service.shortest_path(source, target) for _, target in pairs], args.repeat))
+
+		service.estimate_distance(*pairs[0])
+		estimates = np.array([service.estimate_distance(*pair) for pair in pairs])
+		exact = np.array([len(service.shortest_path(*pair)) - 1 for pair in pairs])
+		assert np.all((estimates[:, 0] <= exact) & (exact <= estimates[:, 1]))
+		report('landmark estimate', _best_time(lambda: [service.shortest_path(*pair) for pair in pairs], args.repeat), _best_time(lambda: [service.estimate_distance(*pair) for pair in pairs], args.repeat))
+		print(f"{'':>6} {'':>8} {'':>18} upper bound exact for {np.mean(estimates[:, 1] == exact):.0%} of pairs, {np.mean(estimates[:, 1] - exact):.2f} hops over on average")
+
+_COLD_START_SCRIPT = """
+import time
+start = time.perf_counter()
+import index
+imported = time.perf_counter() - start
+client = index.app.server.test_client()
+client.get('/')
+first_request = time.perf_counter() - start
+index.visualise.content()
+visualise_layout = time.perf_counter() - start
+while client.get('/ready').status_code != 200:
+	time.sleep(0.01)
+ready = time.perf_counter() - start
+print(imported, first_request, visualise_layout, ready)
+"""
+
+def bench_cold_start(args):
+	"""
+	Fresh-process timings: importing the app, serving the first request, building the visualise page and readiness.
+	"""
+	print(f"{'warm-up':>8} {'import (s)':>11} {'first request (s)':>18} {'visualise (s)':>14} {'ready (s)':>10}")
+	for warm_up in ('1', '0'):
+		env = dict(os.environ, WARM_UP = warm_up)
+		for _ in range(args.repeat):
+			output = subprocess.run([sys.executable, '-c', _COLD_START_SCRIPT], env = env, check = True, capture_output = True, text = True).stdout
+			imported, first_request, visualise_layout, ready = map(float, output.split()[-4:])
+			print(f"{warm_up:>8} {imported:>11.3f} {first_request:>18.3f} {visualise_layout:>14.3f} {ready:>10.3f}")
+
+BENCHMARKS = {
+	'graph_build': bench_graph_build,
+	'centrality_sampling': bench_centrality_sampling,
+	'centrality_parallel': bench_centrality_parallel,
+	'cold_start': bench_cold_start,
+	'clique_index': bench_clique_index,
+	'clique_panel': bench_clique_panel,
+	'graph_figure': bench_graph_figure,
+	'layout_cache': bench_layout_cache,
+	'cyto_detail': bench_cyto_detail,
+	'cyto_elements': bench_cyto_elements,
+	'query_index': bench_query_index,
+	'filter_compile': bench_filter_compile,
+	'ingest': bench_ingest,
+	'filtered_graph': bench_filtered_graph,
+	'csr': bench_csr,
+	'paths': bench_paths
+}
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Data layer benchmarks")
+	parser.add_argument('benchmark', choices = sorted(BENCHMARKS))
+	parser.add_argument('--repeat', type = int, default = 3)
+	parser.add_argument('--scale', type = int, default = 1, help = "Size of the synthetic graph as a multiple of the dataset")
+	parser.add_argument('--workers', type = int, default = os.cpu_count(), help = "Largest worker count for the parallel benchmarks")
+	parser.add_argument('--max-legacy-scale', type = int, default = 10, help = "Largest scale to also time the iterrows and per-edge baselines on")
+	args = parser.parse_args()
+	BENCHMARKS[args.benchmark](args)
@@ -0,0 +1,139 @@
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock, RLock
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+import networkx as nx
+
+
+class LRUCache:
+	"""
+	Least-recently-used cache bounded by an approximate memory budget.
+	------------------
+	max_bytes: Budget shared by all entries, least recently used entries are evicted first
+	sizeof: Returns the estimated size in bytes of a cached value
+	"""
+	def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = lambda value: 1):
+		self.max_bytes = max_bytes
+		self.sizeof = sizeof
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._entries = OrderedDict()
+		self._bytes = 0
+		self._lock = Lock()
+		# Futures of the values get_or_create is building, by key
+		self._pending = {}
+
+	def get(self, key: Hashable, default = None):
+		with self._lock:
+			if key not in self._entries:
+				self.misses += 1
+				return default
+			self.hits += 1
+			self._entries.move_to_end(key)
+			return self._entries[key][0]
+
+	def put(self, key: Hashable, value):
+		size = self.sizeof(value)
+		with self._lock:
+			if key in self._entries:
+				self._bytes -= self._entries.pop(key)[1]
+			# Values larger than the whole budget are never cached
+			if size > self.max_bytes:
+				return value
+			self._entries[key] = (value, size)
+			self._bytes += size
+			while self._bytes > self.max_bytes:
+				_, (_, evicted_size) = self._entries.popitem(last=False)
+				self._bytes -= evicted_size
+				self.evictions += 1
+		return value
+
+	def get_or_create(self, key: Hashable, factory: Callable[[], Any]):
+		"""
+		Returns the cached value for key, calling factory() and caching its result on a miss.
+		Concurrent misses on a key run the factory once: later callers wait for the first one's
+		result (or exception) and count as hits. No lock is held while the factory runs.
+		"""
+		with self._lock:
+			if key in self._entries:
+				self.hits += 1
+				self._entries.move_to_end(key)
+				return self._entries[key][0]
+			pending = self._pending.get(key)
+			building = pending is None
+			if building:
+				self.misses += 1
+				pending = self._pending[key] = Future()
+			else:
+				self.hits += 1
+		if not building:
+			return pending.result()
+
+		try:
+			value = self.put(key, factory())
+		except BaseException as error:
+			pending.set_exception(error)
+			raise
+		else:
+			pending.set_result(value)
+		finally:
+			with self._lock:
+				del self._pending[key]
+		return value
+
+	def items(self) -> List[Tuple[Hashable, Any]]:
+		"""
+		Snapshot of the cached (key, value) pairs, least recently used first, without counting hits.
+		"""
+		with self._lock:
+			return [(key, value) for key, (value, _) in self._entries.items()]
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+			self._bytes = 0
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'entries': len(self._entries),
+				'bytes': self._bytes,
+				'max_bytes': self.max_bytes
+			}
+
+	def __len__(self):
+		return len(self._entries)
+
+	def __contains__(self, key: Hashable):
+		return key in self._entries
+
+def per_frozen_graph(memo: weakref.WeakKeyDictionary, G: nx.Graph, build: Callable[[], Any], valid: Callable[[Any], bool] = None):
+	"""
+	Returns build() for G, computed once per frozen graph and kept in memo until the graph is collected.
+	------------------
+	Graphs that can still change are never memoised. valid can reject a kept value, which is then rebuilt and replaced.
+	"""
+	if not nx.is_frozen(G):
+		return build()
+	value = memo.get(G)
+	if value is None or (valid is not None and not valid(value)):
+		value = memo[G] = build()
+	return value
+
+class KeyedLocks:
+	"""
+	One lock per key, created on first use, so work under one key never waits on work under another.
+	"""
+	def __init__(self):
+		self._locks = {}
+		self._lock = Lock()
+
+	def __call__(self, key: Hashable) -> RLock:
+		with self._lock:
+			return self._locks.setdefault(key, RLock())
@@ -0,0 +1,389 @@
+"""
+Per-node centrality measures and the persisted store of their global values.
+------------------
+The store is a compressed .npz file with one array per column, named after a digest of the
+node and edge CSVs so it is reused until either file changes. Regenerate it offline with
+
+	python3 centrality.py --force
+"""
+import atexit
+import glob
+import itertools
+import os
+import time
+import weakref
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+import config
+import csr
+import helpers
+
+CENTRALITY_COLUMNS = ['degree_centrality', 'betweenness_centrality', 'closeness_centrality', 'clustering_coefficient', 'betweenness_error', 'closeness_error']
+
+CENTRALITY_MODES = ['exact', 'sampled', 'adaptive']
+
+# Pivot sources processed between two checks of the adaptive mode's time budget
+_ADAPTIVE_BATCH_SIZE = 16
+
+def _source_dependencies(indptr: List[int], indices: List[int], source: int) -> Tuple[Dict, Dict]:
+	"""
+	Runs Brandes' BFS from one source position over CSR adjacency lists.
+	------------------
+	Returns the dependency of the source on every other reached position, and the hop distance to every reached position.
+	"""
+	stack = []
+	predecessors = defaultdict(list)
+	sigma = defaultdict(float)
+	sigma[source] = 1.0
+	distance = {source: 0}
+	queue = deque([source])
+	while queue:
+		v = queue.popleft()
+		stack.append(v)
+		distance_v = distance[v]
+		sigma_v = sigma[v]
+		for w in indices[indptr[v]:indptr[v + 1]]:
+			if w not in distance:
+				queue.append(w)
+				distance[w] = distance_v + 1
+			if distance[w] == distance_v + 1:
+				sigma[w] += sigma_v
+				predecessors[w].append(v)
+
+	delta = dict.fromkeys(stack, 0.0)
+	while stack:
+		w = stack.pop()
+		coefficient = (1.0 + delta[w]) / sigma[w]
+		for v in predecessors[w]:
+			delta[v] += sigma[v] * coefficient
+	del delta[source]
+
+	return delta, distance
+
+def _bfs_distances(indptr: List[int], indices: List[int], source: int) -> Dict:
+	distance = {source: 0}
+	queue = deque([source])
+	while queue:
+		v = queue.popleft()
+		for w in indices[indptr[v]:indptr[v + 1]]:
+			if w not in distance:
+				distance[w] = distance[v] + 1
+				queue.append(w)
+	return distance
+
+def _closeness_from_distances(distance: Dict, n: int) -> float:
+	"""
+	Same definition as nx.closeness_centrality, scaled by the reachable fraction of the graph (wf_improved).
+	"""
+	total_distance = sum(distance.values())
+	if total_distance <= 0 or n <= 1:
+		return 0.0
+	reachable = len(distance) - 1.0
+	return (reachable / total_distance) * (reachable / (n - 1))
+
+def _empty_sums(n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+	return np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n, dtype = np.int64)
+
+def _add_sums(totals: Tuple, sums: Tuple):
+	"""
+	Adds the per-position sums of one _partial_sums call into totals, in place.
+	"""
+	for total, partial in zip(totals, sums):
+		total += partial
+
+def _partial_sums(indptr: List[int], indices: List[int], sources: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+	"""
+	Runs one Brandes BFS per source position over the CSR arrays, given as lists.
+	------------------
+	Returns, per position, the sum and the sum of squares of its dependencies over the sources,
+	the sum and the sum of squares of its distances from the sources that reach it, and the number of those sources.
+	"""
+	n = len(indptr) - 1
+	dependency_sum, dependency_sq_sum, distance_sum, distance_sq_sum, reached = [0.0] * n, [0.0] * n, [0.0] * n, [0.0] * n, [0] * n
+	for source in sources:
+		delta, distance = _source_dependencies(indptr, indices, source)
+		for v, dependency in delta.items():
+			dependency_sum[v] += dependency
+			dependency_sq_sum[v] += dependency * dependency
+		for v, hops in distance.items():
+			distance_sum[v] += hops
+			distance_sq_sum[v] += hops * hops
+			reached[v] += 1
+	sums = (dependency_sum, dependency_sq_sum, distance_sum, distance_sq_sum)
+	return (*(np.array(values) for values in sums), np.array(reached, dtype = np.int64))
+
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = Lock()
+
+# Chunks of sources handed to each worker, more than one so uneven chunks balance out
+_CHUNKS_PER_WORKER = 2
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+	"""
+	Returns the process pool shared by all centrality computations, so its start-up cost is paid once per process.
+	The pool is recreated only when the worker count changes.
+	"""
+	global _POOL, _POOL_WORKERS
+	with _POOL_LOCK:
+		if _POOL is None or _POOL_WORKERS != workers:
+			if _POOL is not None:
+				_POOL.shutdown()
+			_POOL = ProcessPoolExecutor(max_workers = workers)
+			_POOL_WORKERS = workers
+		return _POOL
+
+def shutdown_pool():
+	global _POOL, _POOL_WORKERS
+	with _POOL_LOCK:
+		if _POOL is not None:
+			_POOL.shutdown()
+		_POOL = None
+		_POOL_WORKERS = 0
+
+atexit.register(shutdown_pool)
+
+# Adjacency files written for the pool, by graph, removed once their graph is collected
+_ADJACENCY_FILES = weakref.WeakKeyDictionary()
+_ADJACENCY_TOKENS = itertools.count()
+_ADJACENCY_LOCK = Lock()
+
+# The adjacency a pool worker last loaded, by file, so each worker reads a graph once
+_WORKER_ADJACENCY = {}
+
+def _adjacency_file(graph: csr.CSRGraph) -> str:
+	"""
+	Writes the CSR arrays of graph for the pool workers once per graph and returns the file.
+	"""
+	with _ADJACENCY_LOCK:
+		path = _ADJACENCY_FILES.get(graph)
+		if path is None:
+			directory = os.path.join(config.CACHE_DIR, 'adjacency')
+			os.makedirs(directory, exist_ok = True)
+			path = os.path.join(directory, f"{os.getpid()}-{next(_ADJACENCY_TOKENS)}.npz")
+			np.savez(path, indptr = graph.indptr, indices = graph.indices)
+			_ADJACENCY_FILES[graph] = path
+			weakref.finalize(graph, os.remove, path)
+		return path
+
+def _load_adjacency(path: str) -> Tuple[List[int], List[int]]:
+	if path not in _WORKER_ADJACENCY:
+		with np.load(path) as arrays:
+			adjacency = arrays['indptr'].tolist(), arrays['indices'].tolist()
+		_WORKER_ADJACENCY.clear()
+		_WORKER_ADJACENCY[path] = adjacency
+	return _WORKER_ADJACENCY[path]
+
+def _pool_partial_sums(path: str, sources: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+	return _partial_sums(*_load_adjacency(path), sources)
+
+def _sum_sources(graph: csr.CSRGraph, sources: List[int], workers: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+	"""
+	_partial_sums over the source positions, split into chunks across the process pool when workers > 1 and reduced here.
+	Workers load the arrays from _adjacency_file once per graph, the tasks only carry their sources.
+	"""
+	if workers <= 1:
+		return _partial_sums(*graph.adjacency_lists(), sources)
+
+	path = _adjacency_file(graph)
+	n_chunks = max(1, min(len(sources), workers * _CHUNKS_PER_WORKER))
+	pool = get_pool(workers)
+	futures = [pool.submit(_pool_partial_sums, path, sources[idx::n_chunks]) for idx in range(n_chunks)]
+
+	totals = _empty_sums(len(graph))
+	for future in futures:
+		_add_sums(totals, future.result())
+	return totals
+
+def _estimate_betweenness(n: int, dependency_sum: np.ndarray, dependency_sq_sum: np.ndarray, n_pivots: int) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Scales dependency sums over n_pivots uniformly sampled sources into normalised betweenness estimates,
+	together with the standard error of each estimate.
+	"""
+	# Same normalisation as nx.betweenness_centrality(G, k=n_pivots)
+	scale = n / n_pivots
+	if n > 2:
+		scale /= (n - 1) * (n - 2)
+	# Finite population correction, the error vanishes once every node is a pivot
+	correction = (n - n_pivots) / (n - 1) if n > 1 else 0.0
+
+	mean = dependency_sum / n_pivots
+	variance = np.maximum(dependency_sq_sum / n_pivots - mean * mean, 0.0)
+	return dependency_sum * scale, scale * np.sqrt(variance * n_pivots * correction)
+
+def _estimate_closeness(graph: csr.CSRGraph, distance_sum: np.ndarray, distance_sq_sum: np.ndarray, reached: np.ndarray, pivots: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Estimates closeness from the pivots' BFS distances (Eppstein and Wang): the mean distance from a node
+	to the other pivots of its component stands in for its mean distance to the whole component.
+	------------------
+	Returns the estimates and their standard errors, propagated from the standard error of the mean distance.
+	Exact, with no error, once every node is a pivot. Nodes with no other pivot in their component,
+	which are then small components, get an exact BFS.
+	"""
+	n = len(graph)
+	labels = graph.components()
+	size = np.bincount(labels, minlength = n)[labels]
+	count = reached.copy()
+	count[pivots] -= 1
+
+	closeness = np.zeros(n)
+	closeness_error = np.zeros(n)
+	estimated = (size > 1) & (count > 0)
+	count, others = count[estimated], size[estimated] - 1
+	mean = distance_sum[estimated] / count
+	variance = np.maximum(distance_sq_sum[estimated] / count - mean * mean, 0.0)
+	# Finite population correction over the other nodes of the component
+	correction = np.where(others > 1, (others - count) / np.maximum(others - 1, 1), 0.0)
+	closeness[estimated] = (others / (n - 1)) / mean
+	closeness_error[estimated] = closeness[estimated] * np.sqrt(variance / count * correction) / mean
+
+	indptr, indices = graph.adjacency_lists()
+	for v in np.flatnonzero((size > 1) & ~estimated).tolist():
+		closeness[v] = _closeness_from_distances(_bfs_distances(indptr, indices, v), n)
+	return closeness, closeness_error
+
+def _shuffled_positions(n: int, seed: int) -> List[int]:
+	return np.random.RandomState(seed).permutation(n).tolist()
+
+def _adaptive_sums(graph: csr.CSRGraph, time_budget: float, seed: int, workers: int = 1) -> Tuple[Tuple, List[int]]:
+	"""
+	Adds pivot sources in random order until the time budget is spent or every node has been used.
+	Closeness is estimated from the same pivots, so it is charged against the same budget.
+	"""
+	order = _shuffled_positions(len(graph), seed)
+	totals = _empty_sums(len(graph))
+	deadline = time.perf_counter() + time_budget
+	n_pivots = 0
+	while n_pivots < len(order) and (n_pivots == 0 or time.perf_counter() < deadline):
+		batch = order[n_pivots:n_pivots + _ADAPTIVE_BATCH_SIZE * max(workers, 1)]
+		_add_sums(totals, _sum_sources(graph, batch, workers))
+		n_pivots += len(batch)
+	return totals, order[:n_pivots]
+
+def compute_centrality(G: Union[nx.Graph, csr.CSRGraph], mode: str = None, samples: int = None, time_budget: float = None, seed: int = None, workers: int = None) -> pd.DataFrame:
+	"""
+	Returns degree, betweenness and closeness centrality and the clustering coefficient of every node, indexed by node id.
+	------------------
+	G: A csr.CSRGraph, or a networkx graph that is converted to one first
+	mode: 'exact', 'sampled' or 'adaptive', defaults to config.CENTRALITY_MODE
+	samples: Pivot sources used by the sampled mode
+	time_budget: Seconds the adaptive mode may spend adding pivots
+	workers: Processes to spread betweenness and closeness over, defaults to config.CENTRALITY_WORKERS
+
+	betweenness_error and closeness_error hold the standard error of each estimate (0 in exact mode).
+	attrs['centrality'] summarises the run: mode, pivots used, seed, whether closeness is 'exact' or 'sampled',
+	largest standard errors and elapsed seconds.
+	"""
+	mode = mode or config.CENTRALITY_MODE
+	samples = samples or config.CENTRALITY_SAMPLES
+	time_budget = config.CENTRALITY_TIME_BUDGET if time_budget is None else time_budget
+	seed = config.CENTRALITY_SEED if seed is None else seed
+	workers = config.CENTRALITY_WORKERS if workers is None else workers
+	if mode not in CENTRALITY_MODES:
+		raise ValueError(f"Unknown centrality mode {mode!r}, expected one of {CENTRALITY_MODES}")
+
+	start = time.perf_counter()
+	graph = G if isinstance(G, csr.CSRGraph) else csr.CSRGraph.from_networkx(G)
+	n = len(graph)
+	if mode == 'adaptive':
+		sums, pivots = _adaptive_sums(graph, time_budget, seed, workers)
+	else:
+		pivots = _shuffled_positions(n, seed)[:samples] if mode == 'sampled' and samples < n else list(range(n))
+		sums = _sum_sources(graph, pivots, workers)
+	dependency_sum, dependency_sq_sum, distance_sum, distance_sq_sum, reached = sums
+	n_pivots = len(pivots)
+	betweenness, betweenness_error = _estimate_betweenness(n, dependency_sum, dependency_sq_sum, max(n_pivots, 1))
+	closeness, closeness_error = _estimate_closeness(graph, distance_sum, distance_sq_sum, reached, pivots)
+
+	centrality_df = pd.DataFrame({
+		'degree_centrality': graph.degree_centrality(),
+		'betweenness_centrality': betweenness,
+		'closeness_centrality': closeness,
+		'clustering_coefficient': graph.clustering(),
+		'betweenness_error': betweenness_error,
+		'closeness_error': closeness_error
+	}, columns = CENTRALITY_COLUMNS, index = pd.Index(graph.nodes, name = 'id'))
+	centrality_df.attrs['centrality'] = {
+		'mode': mode,
+		'pivots': n_pivots,
+		'seed': seed,
+		'closeness': 'exact' if n_pivots >= n else 'sampled',
+		'workers': workers,
+		'betweenness_error': float(centrality_df['betweenness_error'].max()) if n else 0.0,
+		'closeness_error': float(centrality_df['closeness_error'].max()) if n else 0.0,
+		'elapsed': time.perf_counter() - start
+	}
+	return centrality_df
+
+def store_path(node_file: str, edge_file: str) -> str:
+	return os.path.join(config.CACHE_DIR, f"centrality-{helpers.file_digest(node_file, edge_file)}.npz")
+
+def save_store(centrality_df: pd.DataFrame, path: str):
+	"""
+	Writes the store atomically and removes stores left over from earlier versions of the CSVs.
+	"""
+	directory = os.path.dirname(path)
+	os.makedirs(directory, exist_ok=True)
+
+	summary = centrality_df.attrs.get('centrality', {})
+	helpers.write_atomic(path, lambda f: np.savez_compressed(
+		f,
+		id = centrality_df.index.values,
+		mode = np.array(summary.get('mode', config.CENTRALITY_MODE)),
+		pivots = np.array(summary.get('pivots', len(centrality_df))),
+		seed = np.array(summary.get('seed', config.CENTRALITY_SEED)),
+		**{column: centrality_df[column].values for column in CENTRALITY_COLUMNS}
+	))
+
+	for stale_path in glob.glob(os.path.join(directory, 'centrality-*.npz')):
+		if stale_path != path:
+			os.remove(stale_path)
+
+def load_store(path: str, mode: str = None, samples: int = None, seed: int = None) -> pd.DataFrame:
+	"""
+	Returns the stored centrality frame, or None when there is no store for this version of the data
+	or it was computed with other settings: a different mode, another seed for the pivots, or in
+	sampled mode another number of them.
+	"""
+	mode = mode or config.CENTRALITY_MODE
+	samples = samples or config.CENTRALITY_SAMPLES
+	seed = config.CENTRALITY_SEED if seed is None else seed
+	if not os.path.exists(path):
+		return None
+
+	with np.load(path) as store:
+		if not {'mode', 'pivots', 'seed'} | set(CENTRALITY_COLUMNS) <= set(store.files) or str(store['mode']) != mode:
+			return None
+		n, pivots = len(store['id']), int(store['pivots'])
+		if mode != 'exact' and int(store['seed']) != seed:
+			return None
+		if mode == 'sampled' and pivots != min(samples, n):
+			return None
+		centrality_df = pd.DataFrame({column: store[column] for column in CENTRALITY_COLUMNS}, index = pd.Index(store['id'], name = 'id'))
+		centrality_df.attrs['centrality'] = {
+			'mode': mode,
+			'pivots': pivots,
+			'seed': int(store['seed']),
+			'closeness': 'exact' if pivots >= n else 'sampled',
+			'betweenness_error': float(centrality_df['betweenness_error'].max()) if n else 0.0,
+			'closeness_error': float(centrality_df['closeness_error'].max()) if n else 0.0
+		}
+	return centrality_df
+
+if __name__ == "__main__":
+	import argparse
+
+	parser = argparse.ArgumentParser(description = "Precompute the global centrality store for the data/ CSVs")
+	parser.add_argument('--force', action = 'store_true', help = "Recompute even if a store for the current CSVs exists")
+	args = parser.parse_args()
+
+	import charts
+	centrality_df = charts.compute_centrality_store() if args.force else charts.get_centrality_df()
+	print(f"Centrality store for {len(centrality_df)} nodes: {store_path(charts.NODES_FILE, charts.EDGES_FILE)}")
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 import plotly.graph_objs as go
 import dash_table
@@ -7,11 +7,22 @@ import dash_core_components as dcc
 import numpy as np
 import pandas as pd
 import networkx as nx
+import heapq
+import weakref
 from collections import defaultdict
-from itertools import permutations, groupby
 from operator import itemgetter
-
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+from threading import RLock
+
+import cache
+import centrality
+import columnar
+import config
+import csr
 import helpers
+import layouts
+import paths
+import query
 
 NODES_FILE = 'data/nodes.csv'
 EDGES_FILE = 'data/edges.csv'
@@ -43,54 +54,132 @@ def read_edge_df(edge_file:str):
 	)
 	return edge_df
 
-NODE_DF = read_node_df(NODES_FILE)
-EDGE_DF = read_edge_df(EDGES_FILE)
+# Data is loaded on first use (or by warm_up) so importing this module stays cheap
+_LOADED = {}
+# Each value loads under its own lock, a slow load only holds up the callers that need that value
+_LOAD_LOCKS = cache.KeyedLocks()
+
+def _load_once(name: str, loader):
+	# ingest swaps in a new _LOADED, so hold on to the snapshot the value is read from
+	loaded = _LOADED
+	if name not in loaded:
+		with _LOAD_LOCKS(name):
+			loaded = _LOADED
+			if name not in loaded:
+				loaded[name] = loader()
+	return loaded[name]
+
+def get_node_columns() -> Dict[str, np.ndarray]:
+	"""
+	Node columns as read-only arrays memory-mapped from the columnar cache, shared between worker processes.
+	"""
+	return _load_once('node_columns', lambda: columnar.load_columns(NODES_FILE, read_node_df))
+
+def get_edge_columns() -> Dict[str, np.ndarray]:
+	return _load_once('edge_columns', lambda: columnar.load_columns(EDGES_FILE, read_edge_df))
+
+def get_node_df() -> pd.DataFrame:
+	"""
+	Node frame over the memory-mapped columns, copy = False keeps one block per column instead of
+	consolidating them into a private copy, so the frame stays read-only like its columns.
+	"""
+	return _load_once('node_df', lambda: pd.DataFrame(get_node_columns(), copy = False))
+
+def get_edge_df() -> pd.DataFrame:
+	return _load_once('edge_df', lambda: pd.DataFrame(get_edge_columns(), copy = False))
+
+def get_centrality_df() -> pd.DataFrame:
+	return _load_once('centrality_df', load_centrality_store)
+
+def get_csr_graph() -> csr.CSRGraph:
+	"""
+	The full graph as CSR arrays with columnar node attributes, for analytics that don't need networkx.
+	"""
+	return _load_once('csr_graph', lambda: csr.CSRGraph.from_frames(get_node_df(), get_edge_df()))
+
+def get_path_service() -> paths.PathService:
+	"""
+	Shortest path queries over the full graph of the current snapshot.
+	"""
+	return _load_once('path_service', lambda: paths.PathService(get_csr_graph()))
+
+def is_ready() -> bool:
+	"""
+	True once the data and global centrality have been loaded, so requests no longer pay for start-up work.
+	"""
+	return all(name in _LOADED for name in ('node_df', 'edge_df', 'centrality_df'))
+
+def warm_up():
+	"""
+	Loads the data, the centrality store and the unfiltered graph ahead of the first request.
+	"""
+	get_node_df()
+	get_edge_df()
+	get_centrality_df()
+	get_dataset_summary()
+	generate_graph()
 
 def get_nclique_options():
 	G = generate_graph()
-	clique_graph_table_info = get_cliques_by_size(G)
+	clique_index = get_clique_index(G)
 
-	return [str(i+1) for i in range(len(clique_graph_table_info))]
+	return [str(i+1) for i in range(len(clique_index))]
 
-def get_unique_genres(df = NODE_DF):
-	return sorted(df['genre'].unique())
+class DatasetSummary:
+	"""
+	Filter option metadata of the node columns, computed once per snapshot of the data.
+	------------------
+	unique: Sorted unique values of the categorical columns
+	quartiles: (min, q1, median, q3, max) of the columns filtered by quartile ranges
+	deciles: The 0th to 10th decile of the columns filtered by decile sliders
+	"""
+	UNIQUE_COLUMNS = ['genre', 'avg_rating']
+	QUARTILE_COLUMNS = ['sales_rank', 'num_reviews']
+	DECILE_COLUMNS = ['num_pages', 'price']
+
+	def __init__(self, df: pd.DataFrame):
+		self.unique = {column: sorted(df[column].unique()) for column in self.UNIQUE_COLUMNS}
+		self.quartiles = {
+			column: (df[column].min(), *df[column].quantile([0.25, 0.5, 0.75]).tolist(), df[column].max())
+			for column in self.QUARTILE_COLUMNS
+		}
+		self.deciles = {column: df[column].quantile([i * 0.1 for i in range(0, 11)]).to_numpy() for column in self.DECILE_COLUMNS}
+
+	def quartile_categories(self, column: str) -> List[str]:
+		lowest, q1, median, q3, highest = (int(value) for value in self.quartiles[column])
+		return [
+			f"{lowest} - {q1}",
+			f"{q1 + 1} - {median}",
+			f"{median + 1} - {q3}",
+			f"{q3 + 1} - {highest}"
+		]
 
-def get_sales_rank_categories(df = NODE_DF):
-	lowest = int(df['sales_rank'].min())
-	q1 = int(df['sales_rank'].quantile(0.25))
-	median = int(df['sales_rank'].quantile(0.5))
-	q3 = int(df['sales_rank'].quantile(0.75))
-	highest = int(df['sales_rank'].max())
-	return [
-		f"{lowest} - {q1}",
-		f"{q1 + 1} - {median}",
-		f"{median + 1} - {q3}",
-		f"{q3 + 1} - {highest}"
-	]
+def get_dataset_summary(df = None) -> DatasetSummary:
+	"""
+	Summary of the given frame, or the cached one of the current snapshot's nodes.
+	"""
+	return _load_once('summary', lambda: DatasetSummary(get_node_df())) if df is None else DatasetSummary(df)
 
-def get_unique_ratings(df = NODE_DF):
-	return sorted(df['avg_rating'].unique())
+def get_unique_genres(df = None):
+	return get_dataset_summary(df).unique['genre']
 
-def get_review_categories(df = NODE_DF):
-	lowest = int(df['num_reviews'].min())
-	q1 = int(df['num_reviews'].quantile(0.25))
-	median = int(df['num_reviews'].quantile(0.5))
-	q3 = int(df['num_reviews'].quantile(0.75))
-	highest = int(df['num_reviews'].max())
-	return [
-		f"{lowest} - {q1}",
-		f"{q1 + 1} - {median}",
-		f"{median + 1} - {q3}",
-		f"{q3 + 1} - {highest}"
-	]
+def get_sales_rank_categories(df = None):
+	return get_dataset_summary(df).quartile_categories('sales_rank')
+
+def get_unique_ratings(df = None):
+	return get_dataset_summary(df).unique['avg_rating']
+
+def get_review_categories(df = None):
+	return get_dataset_summary(df).quartile_categories('num_reviews')
 
-def get_num_pages_quantiles(df = NODE_DF):
-	return [int(df['num_pages'].quantile(i * 0.1)) for i in range(0, 11)]
+def get_num_pages_quantiles(df = None):
+	return [int(value) for value in get_dataset_summary(df).deciles['num_pages']]
 
-def get_price_quantiles(df = NODE_DF):
-	return [round(df['price'].quantile(i * 0.1), 2) for i in range(0, 11)]
+def get_price_quantiles(df = None):
+	return np.round(get_dataset_summary(df).deciles['price'], 2).tolist()
 
-def get_generic_insights(data_df:pd.DataFrame = NODE_DF):
+def get_generic_insights(data_df:pd.DataFrame = None):
+	data_df = get_node_df() if data_df is None else data_df
 	most_common_genre = data_df['genre'].mode()[0]
 	
 	min_pages = data_df['num_pages'].min()
@@ -169,23 +258,32 @@ def get_generic_insights(data_df:pd.DataFrame = NODE_DF):
 	return figure
 
 
-def get_stats_table(data_df: pd.DataFrame = NODE_DF):
+STATS_PAGE_SIZE = 20
+
+def get_stats_table(data_df: pd.DataFrame = None):
 	"""
 	Returns filterable table
+	Filtering, sorting and paging run on the server, the table only receives the page it shows.
 	"""
+	data_df = get_node_df() if data_df is None else data_df
+	page, total = query_stats_table(data_df = data_df)
 	stats_table = dash_table.DataTable(
 		id = "stats_table",
 		columns = [
 			{"name": i, "id": i, "deletable": False, "selectable": True} for i in data_df
 		],
-		data = data_df.to_dict('records'),
+		data = page,
 		filter_action="custom",
 		filter_query="",
-		sort_action="native",
+		sort_action="custom",
 		sort_mode="multi",
+		sort_by=[],
+		page_action="custom",
+		page_current=0,
+		page_count=stats_page_count(total),
 		style_as_list_view = True,
 		merge_duplicate_headers = True,
-		page_size = 20,
+		page_size = STATS_PAGE_SIZE,
 		style_header = {
 			'backgroundColor': 'white',
 			'fontWeight': 'bold',
@@ -216,20 +314,59 @@ def get_stats_table(data_df: pd.DataFrame = NODE_DF):
 	)
 	return stats_table
 
-def filter_stats_table(filter):
-	filtering_expressions = filter.split(' && ')
-	dff = NODE_DF
-	for filter_part in filtering_expressions:
-		col_name, operator, filter_value = helpers.split_filter_part(filter_part)
-
-		if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
-			# these operators match pandas series operator method names
-			dff = dff.loc[getattr(dff[col_name], operator)(filter_value)]
-		elif operator == 'contains':
-			dff = dff.loc[dff[col_name].str.contains(filter_value)]
-		elif operator == 'datestartswith':
-			dff = dff.loc[dff[col_name].str.startswith(filter_value)]
-	return dff
+def stats_page_count(total:int, page_size:int = STATS_PAGE_SIZE) -> int:
+	return max(-(-total // page_size), 1)
+
+def query_stats_table(filter:str = '', sort_by:List[Dict] = None, page_current:int = 0, page_size:int = STATS_PAGE_SIZE, data_df:pd.DataFrame = None) -> Tuple[List[Dict], int]:
+	"""
+	Returns the rows of one page of the stats table, and the number of rows matching the filter.
+	------------------
+	filter: DataTable filter_query
+	sort_by: DataTable sort_by, [{'column_id': ..., 'direction': 'asc' or 'desc'}, ...] applied in order
+	"""
+	dff = filter_stats_table(filter or '', data_df)
+	total = len(dff)
+	start = page_current * page_size
+
+	if sort_by:
+		columns = [sort['column_id'] for sort in sort_by]
+		ascending = [sort['direction'] == 'asc' for sort in sort_by]
+		# A single column only needs the rows up to the end of the page in order
+		if len(columns) == 1 and start + page_size < total and not dff[columns[0]].hasnans:
+			select = dff.nsmallest if ascending[0] else dff.nlargest
+			dff = select(start + page_size, columns[0], keep = 'first')
+		else:
+			dff = dff.sort_values(columns, ascending = ascending, kind = 'mergesort')
+
+	return dff.iloc[start:start + page_size].to_dict('records'), total
+
+def get_stats_index() -> query.TableIndex:
+	return _load_once('stats_index', lambda: query.TableIndex(get_node_df()))
+
+def stats_query_cache_stats() -> Dict[str,int]:
+	# Only reported once the index exists, so monitoring never triggers the data load
+	return _LOADED['stats_index'].cache_stats() if 'stats_index' in _LOADED else {}
+
+def filter_stats_table(filter, data_df:pd.DataFrame = None):
+	"""
+	Returns the rows matching a DataTable filter_query, answered from the indexes of get_stats_index.
+	Clauses can be joined with && and || and grouped with parentheses, a query that doesn't parse raises ValueError.
+	"""
+	index = get_stats_index() if data_df is None or data_df is get_node_df() else query.TableIndex(data_df)
+	return index.filter(filter)
+
+def _correlation_graph() -> nx.Graph:
+	"""
+	Complete graph of the node features weighted by their pairwise correlation, computed once for the loaded data.
+	"""
+	def build():
+		cor_matrix = get_node_df().iloc[:, 1:].corr()
+		node_idx = cor_matrix.index.values
+
+		cor_G = nx.from_numpy_matrix(np.asmatrix(cor_matrix))
+		return nx.relabel_nodes(cor_G, lambda x: node_idx[x])
+
+	return _load_once('correlation_graph', build)
 
 def _compute_correlations_traces(corr_direction: str):
 	"""
@@ -239,22 +376,14 @@ def _compute_correlations_traces(corr_direction: str):
 	direction = positive: Only returns the positive correlations and delete the edges with weight smaller than 0
 	direction = negative: Only returns the negative correlations and delete the edges with weight equal or larger than 0
 	"""
-	node_df = read_node_df(NODES_FILE)
-	cor_matrix = node_df.iloc[:, 1:].corr()
-	node_idx = cor_matrix.index.values
+	cor_G = _correlation_graph()
 
-	cor_matrix = np.asmatrix(cor_matrix)
-	cor_G = nx.from_numpy_matrix(cor_matrix)
-	cor_G = nx.relabel_nodes(cor_G, lambda x: node_idx[x])
-	
-	cor_G_copy = cor_G.copy()
-	for feature_1, feature_2, weight in cor_G.edges(data=True):
-		if corr_direction == "Positive":
-			if weight["weight"] < 0:
-				cor_G_copy.remove_edge(feature_1, feature_2)
-		else:
-			if weight["weight"] >= 0:
-				cor_G_copy.remove_edge(feature_1, feature_2)
+	cor_G_copy = nx.Graph()
+	cor_G_copy.add_nodes_from(cor_G)
+	if corr_direction == "Positive":
+		cor_G_copy.add_edges_from((feature_1, feature_2, weight) for feature_1, feature_2, weight in cor_G.edges(data=True) if weight["weight"] >= 0)
+	else:
+		cor_G_copy.add_edges_from((feature_1, feature_2, weight) for feature_1, feature_2, weight in cor_G.edges(data=True) if weight["weight"] < 0)
 
 	# Generate circular layout positions
 	pos = nx.circular_layout(cor_G_copy)
@@ -307,9 +436,8 @@ def _compute_correlations_traces(corr_direction: str):
 	edge_adjacencies = []
 	edge_text = []
 	for edge_pair in cor_G_copy.edges():
-		wanted_weights = _get_weights(cor_G_copy, edge_pair[0])
 		if edge_pair[0] != edge_pair[1]: 
-			cur_weight = wanted_weights[edge_pair[1]]['weight']
+			cur_weight = cor_G_copy[edge_pair[0]][edge_pair[1]]['weight']
 
 			edge_adjacencies.append(cur_weight)
 			edge_text.append(
@@ -342,18 +470,14 @@ def _compute_correlations_traces(corr_direction: str):
 
 	return node_trace, edge_trace, trace_text
 
-def _get_weights(G: nx.Graph, matching_col: str):
-	adj_weights = list(G.adjacency())
-	wanted_weights = None
-	for col in adj_weights:
-		if col[0] == matching_col:
-			wanted_weights = col[1]
-	return wanted_weights
-
 def generate_correlation_network(corr_direction: str):
 	"""
 	Returns Plotly Graph object for correlation network.
+	Figures are built once per direction for the loaded data, later callbacks reuse them.
 	"""
+	return _load_once(f'correlation_network_{corr_direction}', lambda: _build_correlation_network(corr_direction))
+
+def _build_correlation_network(corr_direction: str):
 	node_traces, edge_traces, trace_text = _compute_correlations_traces(corr_direction)
 
 	fig = go.Figure(
@@ -374,26 +498,24 @@ def generate_correlation_network(corr_direction: str):
 
 	return fig
 
-def _compute_centrality_measures(G: nx.Graph):
-	degree_centrality = list(nx.degree_centrality(G).values())
-	betweenness_centrality = list(nx.betweenness_centrality(G).values())
-	closeness_centrality = list(nx.closeness_centrality(G).values())
+def _compute_centrality_measures(G: nx.Graph, centrality_df: pd.DataFrame = None, mode: str = None):
+	"""
+	Sets degree, betweenness and closeness centrality and the clustering coefficient on every node.
+	Values are looked up in centrality_df when given (e.g. the global store), otherwise computed on G itself in the given mode.
+	G.graph['centrality'] records the mode, pivots and estimated errors the values came from,
+	and G.graph['centrality_df'] the values themselves, for reading them a column at a time.
+	"""
+	if centrality_df is None:
+		centrality_df = centrality.compute_centrality(G, mode = mode)
+	G.graph['centrality'] = centrality_df.attrs.get('centrality')
+	G.graph['centrality_df'] = centrality_df
+	values = centrality_df.reindex(list(G.nodes()))
 
-	for idx, node_id in enumerate(G.nodes()):
-		G.nodes[node_id]['degree_centrality'] = degree_centrality[idx]
-		G.nodes[node_id]['betweenness_centrality'] = betweenness_centrality[idx]
-		G.nodes[node_id]['closeness_centrality'] = closeness_centrality[idx]
+	for column in centrality.CENTRALITY_COLUMNS:
+		nx.set_node_attributes(G, dict(zip(values.index, values[column].values.tolist())), column)
 
 	return G
 
-def _compute_clustering_coefficients(G: nx.Graph):
-	clustering_coefficients = nx.clustering(G)
-	
-	for idx in G.nodes():
-		G.nodes[idx]['clustering_coefficient'] = clustering_coefficients[idx]
-	
-	return G
-
 def _compute_adjacencies(G: nx.Graph):    
 	for idx in G.nodes():
 		G.nodes[idx]['num_connections'] = len(G[idx])
@@ -403,188 +525,491 @@ def _compute_adjacencies(G: nx.Graph):
 """
 Clique Analysis
 """
-def _generate_intracluster_strength(G:nx.Graph, nodes: List[int]) -> int:
-	node_pairs = [sorted(pair) for pair in permutations(nodes, 2)]
-	node_pairs.sort()
-	node_pairs = list(k for k,_ in groupby(node_pairs))
-	
-	total_interactions = 0
-	for pair in node_pairs:
-		total_interactions += G[pair[0]][pair[1]]['weight']
-	
-	return total_interactions/len(nodes)
+def _generate_intracluster_strengths(G:nx.Graph, clique_nodes: np.ndarray, positions: np.ndarray) -> np.ndarray:
+	"""
+	Intracluster strength (total weight of the clique's edges per node) of every clique of one size at once.
+	------------------
+	clique_nodes: Distinct nodes of the cliques
+	positions: (number of cliques x size) indexes into clique_nodes
+	"""
+	n_nodes = len(clique_nodes)
+	position_of = dict(zip(clique_nodes.tolist(), range(n_nodes)))
+
+	# Weights of the edges among clique nodes, sorted by an encoded (lower position, higher position) key
+	edge_keys = []
+	edge_weights = []
+	for source, target, weight in G.subgraph(position_of).edges(data='weight'):
+		low, high = sorted((position_of[source], position_of[target]))
+		edge_keys.append(low * n_nodes + high)
+		edge_weights.append(weight)
+	order = np.argsort(edge_keys)
+	edge_keys = np.array(edge_keys, dtype=np.int64)[order]
+	edge_weights = np.array(edge_weights, dtype=float)[order]
+
+	# Every unordered node pair of every clique is an edge, look them all up together
+	size = positions.shape[1]
+	first, second = np.triu_indices(size, k=1)
+	low = np.minimum(positions[:, first], positions[:, second])
+	high = np.maximum(positions[:, first], positions[:, second])
+	pair_weights = edge_weights[np.searchsorted(edge_keys, low * n_nodes + high)]
+
+	return pair_weights.sum(axis=1) / size
+
+# Rough per-element footprint of a networkx graph carrying our node attributes
+_GRAPH_NODE_BYTES = 1024
+_GRAPH_EDGE_BYTES = 512
+
+# A subgraph view only holds the set of its nodes, the rest is shared with the full graph
+_GRAPH_VIEW_NODE_BYTES = 64
+
+def _estimate_graph_bytes(G: nx.Graph) -> int:
+	if nx.is_frozen(G) and hasattr(G, '_graph'):
+		return len(G) * _GRAPH_VIEW_NODE_BYTES
+	return len(G) * _GRAPH_NODE_BYTES + G.number_of_edges() * _GRAPH_EDGE_BYTES
+
+GRAPH_CACHE = cache.LRUCache(config.GRAPH_CACHE_MAX_BYTES, sizeof = _estimate_graph_bytes)
+
+# Filters that select a set of categories, so the order they were picked in doesn't change the graph
+_UNORDERED_FILTERS = ['genre_filter', 'rating_filter', 'sales_rank_filter', 'reviews_filter']
+
+def _graph_cache_key(dataset:str, filters, nodelist, local_centrality:bool, centrality_mode:str):
+	"""
+	Normalises the filter dict into a hashable key, so equivalent filter states share one graph.
+	"""
+	# Graphs built from an earlier snapshot of the data are never served after an ingest
+	version = snapshot_version()
+
+	# Without filters the full graph is built and nodelist is ignored
+	if not filters:
+		return (version, dataset, (), None, False, None)
+
+	key = []
+	for filter_name, value in sorted(filters.items()):
+		# The clique size only selects what to draw from the graph
+		if filter_name == 'nclique_filter':
+			continue
+		if filter_name == 'nodes_filter':
+			# An explicit nodelist takes precedence over the typed node filter
+			if nodelist is not None or not value:
+				continue
+			value = tuple(sorted(set(value.split(','))))
+		elif type(value) != list:
+			value = (value,)
+		elif filter_name in _UNORDERED_FILTERS:
+			value = tuple(sorted(value))
+		else:
+			value = tuple(value)
+		key.append((filter_name, value))
+
+	if nodelist is not None:
+		nodelist = tuple(sorted(set(nodelist)))
+
+	# The mode only matters when centrality is recomputed on the subgraph
+	centrality_mode = (centrality_mode or config.CENTRALITY_MODE) if local_centrality else None
+
+	return (version, dataset, tuple(key), nodelist, local_centrality, centrality_mode)
+
+def graph_cache_stats() -> Dict[str,int]:
+	return GRAPH_CACHE.stats()
+
+def generate_graph(dataset:str='amazon', filters = None, nodelist = None, local_centrality:bool = False, centrality_mode:str = None):
+	"""
+	Returns the graph for the given filter state.
+	Graphs are frozen and shared, the full graph through its snapshot and filtered ones through GRAPH_CACHE,
+	so callers must copy before modifying them.
+	------------------
+	local_centrality: Recompute centrality on the filtered subgraph instead of using the global store values
+	centrality_mode: 'exact', 'sampled' or 'adaptive' betweenness for local_centrality, defaults to config.CENTRALITY_MODE
+	"""
+	if dataset == 'amazon' and not filters:
+		return get_full_graph()
+	key = _graph_cache_key(dataset, filters, nodelist, local_centrality, centrality_mode)
+	return GRAPH_CACHE.get_or_create(key, lambda: nx.freeze(_build_graph(dataset, filters, nodelist, local_centrality, centrality_mode)))
+
+def get_full_graph() -> nx.Graph:
+	"""
+	The frozen unfiltered graph, pinned with the frames of its snapshot rather than kept in GRAPH_CACHE,
+	so the filtered views over it never force a rebuild from the frames.
+	"""
+	return _load_once('full_graph', lambda: nx.freeze(_build_graph()))
+
+NODE_ATTRIBUTES = ['id', 'genre', 'num_pages', 'price', 'sales_rank', 'avg_rating', 'num_reviews']
 
-def generate_graph(dataset:str='amazon', filters = None, nodelist = None):
+def _graph_from_frames(node_df: pd.DataFrame, edge_df: pd.DataFrame) -> nx.Graph:
+	"""
+	Builds the co-purchase graph in bulk from the node and edge columns.
+	Reads column by column, selecting several columns of the frame would consolidate its memory-mapped blocks into a copy.
+	G.graph['node_df'] keeps the frame and G.graph['node_index'] the row position of each id, for reading attributes a column at a time.
+	"""
+	G = nx.Graph(node_df = node_df, node_index = pd.Index(node_df['id'].to_numpy()))
+	columns = [node_df[column].values.tolist() for column in NODE_ATTRIBUTES]
+	node_attributes = (dict(zip(NODE_ATTRIBUTES, values)) for values in zip(*columns))
+	G.add_nodes_from(zip(node_df['id'].values.tolist(), node_attributes))
+	G.add_weighted_edges_from(zip(
+		edge_df['source'].values.tolist(),
+		edge_df['target'].values.tolist(),
+		edge_df['weight'].values.tolist()
+	))
+	return G
+
+_FILTER_COLUMNS = {
+	'genre_filter' : 'genre',
+	'sales_rank_filter' : 'sales_rank',
+	'rating_filter' : 'avg_rating',
+	'reviews_filter' : 'num_reviews',
+	'page_filter' : 'num_pages',
+	'price_filter' : 'price',
+	'nclique_filter' : 'nclique',
+	'nodes_filter': 'nodes'
+}
+
+def _node_mask(node_df: pd.DataFrame, filters, nodelist = None, summary: DatasetSummary = None) -> np.ndarray:
+	"""
+	Boolean mask of the rows of node_df selected by the filters, computed over the shared column arrays.
+	------------------
+	summary: Deciles the page and price sliders select between, defaults to the current snapshot's, as shown on the sliders
+	An explicit nodelist takes precedence over the typed node filter.
+	"""
+	summary = get_dataset_summary() if summary is None else summary
+	mask = np.ones(len(node_df), dtype = bool)
+
+	for filter_name, value in filters.items():
+		column = _FILTER_COLUMNS[filter_name]
+		if type(value) != list:
+			value = [value]
+
+		if column in ['genre', 'avg_rating']:
+			mask &= node_df[column].isin(value).to_numpy()
+
+		elif column in ['sales_rank', 'num_reviews']:
+			values = node_df[column].to_numpy()
+			in_ranges = np.zeros(len(node_df), dtype = bool)
+			for value_range in value:
+				low, high = value_range.split(" - ")
+				in_ranges |= (values >= int(low)) & (values <= int(high))
+			mask &= in_ranges
+
+		elif column in ['num_pages', 'price']:
+			low, high = value
+			values = node_df[column].to_numpy()
+			deciles = summary.deciles[column]
+			mask &= (values >= deciles[low]) & (values <= deciles[high])
+
+		elif column in ['nodes']:
+			value = value[0]
+			if value and nodelist == None:
+				nodelist = value.split(',')
+
+	if nodelist != None:
+		mask &= node_df['id'].isin(nodelist).to_numpy()
+
+	return mask
+
+class _ShowNodesInOrder(nx.filters.show_nodes):
+	"""
+	Node filter of a subgraph view that iterates its nodes in the order given rather than in set order,
+	so a view lists its nodes like a graph built from the same rows.
+	"""
+	def __init__(self, nodes):
+		self.nodes = dict.fromkeys(nodes)
+
+def _build_graph(dataset:str='amazon', filters = None, nodelist = None, local_centrality:bool = False, centrality_mode:str = None):
+	"""
+	Builds the full graph from the frames, or a filtered graph from the full one.
+	------------------
+	A filtered graph is a read-only view of the pinned full graph induced by the selected nodes,
+	sharing its node and edge attributes, so its cost scales with the selection rather than the dataset.
+	With local_centrality the view is copied instead, since the recomputed values differ from the full graph's.
+	"""
 	G = nx.Graph()
 	
 	if dataset == 'amazon':
-		node_df = NODE_DF
-		edge_df = EDGE_DF
-		
 		if filters:
-			filter_mapping = {
-				'genre_filter' : 'genre',
-				'sales_rank_filter' : 'sales_rank',
-				'rating_filter' : 'avg_rating',
-				'reviews_filter' : 'num_reviews',
-				'page_filter' : 'num_pages',
-				'price_filter' : 'price',
-				'nclique_filter' : 'nclique',
-				'nodes_filter': 'nodes'
-			}
+			node_df = get_node_df()
+			keep_nodes = node_df['id'].to_numpy()[_node_mask(node_df, filters, nodelist)]
+			G = nx.subgraph_view(get_full_graph(), filter_node = _ShowNodesInOrder(keep_nodes.tolist()))
 
-			filtered_df = node_df.copy()
-
-			for filter_name, value in filters.items():
-				column = filter_mapping[filter_name]
-				if type(value) != list:
-					value = [value]
-
-				if column in ['genre', 'avg_rating']:
-					filtered_df = filtered_df[filtered_df[column].isin(value)]
-
-				elif column in ['sales_rank', 'num_reviews']:
-					temp_df = pd.DataFrame()
-					for value_range in value:
-						low, high = value_range.split(" - ")
-						df_slice = filtered_df[filtered_df[column].between(int(low), int(high))]
-						temp_df = temp_df.append(df_slice)
-					filtered_df = temp_df
-
-				elif column in ['num_pages', 'price']:
-					low, high = value
-					low_quantile = filtered_df[column].quantile(low * 0.1)
-					high_quantile = filtered_df[column].quantile(high * 0.1)
-					filtered_df = filtered_df[filtered_df[column].between(low_quantile, high_quantile)]
-			
-				elif column in ['nodes']:
-					value = value[0]
-					if value and nodelist == None:
-						nodelist = value.split(',')
-
-
-			if nodelist != None:
-				filtered_df = filtered_df[filtered_df['id'].isin(nodelist)]
-			
-			keep_nodes = filtered_df['id']
-
-			node_df = filtered_df
-
-			edge_df = edge_df[edge_df['source'].isin(keep_nodes) & edge_df['target'].isin(keep_nodes)]
-
-		# Create Nodes
-		for index, row in node_df.iterrows():
-			node_info = {
-				'id': row['id'],
-				'genre': row['genre'],
-				'num_pages': row['num_pages'],
-				'price': row['price'],
-				'sales_rank': row['sales_rank'],
-				'avg_rating': row['avg_rating'],
-				'num_reviews': row['num_reviews']
-			}
-			G.add_node(row['id'], id=node_info['id'])
-			G.nodes[row['id']]['genre'] = node_info['genre']
-			G.nodes[row['id']]['num_pages'] = node_info['num_pages']
-			G.nodes[row['id']]['price'] = node_info['price']
-			G.nodes[row['id']]['sales_rank'] = node_info['sales_rank']
-			G.nodes[row['id']]['avg_rating'] = node_info['avg_rating']
-			G.nodes[row['id']]['num_reviews'] = node_info['num_reviews']
-		# Create edges
-		for index, row in edge_df.iterrows():
-			edge_info = {
-				'source': row['source'],
-				'target': row['target'],
-				'weight': row['weight']
-			}
-			G.add_edge(edge_info['source'], edge_info['target'], weight=edge_info['weight'])
-		
-		# Centrality calculations
-		G = _compute_centrality_measures(G)
-		
-		# Clustering coefficients
-		G = _compute_clustering_coefficients(G)
+			# Centrality calculations, only subgraph-local values need computing here
+			if local_centrality:
+				G = _compute_adjacencies(_compute_centrality_measures(nx.Graph(G), mode = centrality_mode))
+			return G
 
+		G = _graph_from_frames(get_node_df(), get_edge_df())
+		G = _compute_centrality_measures(G, get_centrality_df())
 		G = _compute_adjacencies(G)
 	
 	return G
 
+_CLIQUE_INDEXES = weakref.WeakKeyDictionary()
+
+def get_clique_index(G:nx.Graph) -> Dict[int,np.ndarray]:
+	"""
+	Maximal cliques of G by size, enumerated once per frozen graph.
+	------------------
+	Maps each clique size to a (number of cliques x size) array of node ids, one row per clique in enumeration order.
+	"""
+	def build():
+		cliques_by_size = defaultdict(list)
+		for clique in nx.find_cliques(G):
+			cliques_by_size[len(clique)].append(clique)
+		return {size: np.array(cliques) for size, cliques in sorted(cliques_by_size.items())}
+	return cache.per_frozen_graph(_CLIQUE_INDEXES, G, build)
+
 def get_cliques_by_size(G:nx.Graph) -> Dict[str,List[int]]:
-	maximal_cliques = list(nx.find_cliques(G))
-	maximal_clique_sizes = [len(clique) for clique in list(nx.find_cliques(G))]
-	
 	maximal_cliques_dict = defaultdict(list)
-	for idx in range(len(maximal_cliques)):
-		maximal_cliques_dict[maximal_clique_sizes[idx]].append({'nodes': maximal_cliques[idx]})
+	for size, cliques in get_clique_index(G).items():
+		maximal_cliques_dict[size] = [{'nodes': clique} for clique in cliques.tolist()]
 	
 	return maximal_cliques_dict
 
-def generate_clique_metrics(G: nx.Graph, n_size) -> Dict[str,List[int]]:
-	maximal_cliques_dict = get_cliques_by_size(G)
-	
-	for k,v in maximal_cliques_dict.items():
-		for clique_info in v:
-			avg_price = np.mean([G.nodes[node]['price'] for node in clique_info['nodes']])
-			avg_rating = np.mean([G.nodes[node]['avg_rating'] for node in clique_info['nodes']])
-			avg_review = np.mean([G.nodes[node]['num_reviews'] for node in clique_info['nodes']])
-			
-			clique_info['avg_price'] = avg_price
-			clique_info['avg_rating'] = avg_rating
-			clique_info['avg_review'] = avg_review
-			clique_info['intracluster_strength'] = _generate_intracluster_strength(G, clique_info['nodes'])
-	
-	return maximal_cliques_dict[n_size]
+def generate_clique_metrics(G: nx.Graph, n_size) -> List[Dict]:
+	"""
+	Returns the maximal cliques of size n_size with their average price, rating and reviews and their intracluster strength.
+	All cliques of the size are measured in one pass over attribute arrays gathered once for their nodes.
+	"""
+	cliques = get_clique_index(G).get(n_size)
+	if cliques is None:
+		return []
 
-# Initialize NetworkX graph
-networkGraph = generate_graph()
+	clique_nodes, positions = np.unique(cliques, return_inverse=True)
+	positions = positions.reshape(cliques.shape)
 
-def plot_graph(G = networkGraph, params = None):
-	chart_type_option = 'spring'
+	averages = {}
+	for metric, attribute in [('avg_price', 'price'), ('avg_rating', 'avg_rating'), ('avg_review', 'num_reviews')]:
+		values = np.array([G.nodes[node][attribute] for node in clique_nodes.tolist()], dtype=float)
+		averages[metric] = values[positions].mean(axis=1)
+	intracluster_strengths = _generate_intracluster_strengths(G, clique_nodes, positions)
 
-	if params:
-		chart_type_option = params.pop('chart_type_option')
-		valid_params = {key : value for key, value in params.items() if value}
-		G = generate_graph(filters = valid_params)
+	return [
+		{
+			'nodes': nodes,
+			'avg_price': averages['avg_price'][idx],
+			'avg_rating': averages['avg_rating'][idx],
+			'avg_review': averages['avg_review'][idx],
+			'intracluster_strength': intracluster_strengths[idx]
+		} for idx, nodes in enumerate(cliques.tolist())
+	]
 
-	layouts = {
-		'circular' : lambda g : nx.circular_layout(g),
-		'kamada-kawai' : lambda g : nx.kamada_kawai_layout(g),
-		'random' : lambda g : nx.random_layout(g),
-		'shell' : lambda g : nx.shell_layout(g),
-		'spring' : lambda g : nx.spring_layout(g),
-		'spectral' : lambda g : nx.spectral_layout(g)
-	}
+def compute_centrality_store() -> pd.DataFrame:
+	"""
+	Computes global centrality on the full graph and persists it for later startups.
+	"""
+	centrality_df = centrality.compute_centrality(get_csr_graph())
+	centrality.save_store(centrality_df, centrality.store_path(NODES_FILE, EDGES_FILE))
+	return centrality_df
+
+def load_centrality_store() -> pd.DataFrame:
+	"""
+	Returns global centrality from the persisted store, computing it only if the CSVs changed since it was written.
+	"""
+	centrality_df = centrality.load_store(centrality.store_path(NODES_FILE, EDGES_FILE))
+	if centrality_df is None:
+		centrality_df = compute_centrality_store()
+	return centrality_df
 
-	pos = layouts[chart_type_option](G)
+"""
+Incremental updates
+"""
+# Serialises ingests and centrality swaps, readers never wait on it
+_INGEST_LOCK = RLock()
+# Stale centrality is recomputed one snapshot at a time, superseded snapshots are skipped
+_RECOMPUTE_EXECUTOR = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "centrality")
+_RECOMPUTE_FUTURES = []
 
-	edge_x = []
-	edge_y = []
+def snapshot_version() -> int:
+	"""
+	Number of snapshots published by ingest and the centrality recomputations since the data was loaded.
+	"""
+	return _LOADED.get('version', 0)
 
-	edge_traces = []
+def snapshot_status() -> Dict:
+	G = _LOADED.get('full_graph')
+	summary = (G.graph.get('centrality') or {}) if G is not None else {}
+	return {'version': snapshot_version(), 'centrality_stale': bool(summary.get('stale', False))}
 
-	for edge in G.edges(data = True):
-		start, end, data = edge
-		x0, y0 = pos[start]
-		x1, y1 = pos[end]
+def _swap_snapshot(loaded: Dict, G: nx.Graph):
+	"""
+	Publishes a new snapshot of the data together with its full graph.
+	Requests that already read the previous snapshot finish on it, later ones only see the new one.
+	Rebinding _LOADED is atomic, so publishing never waits on a load in progress. Graphs of the old
+	snapshot that land in GRAPH_CACHE after the clear are keyed by its version and never read again.
+	"""
+	global _LOADED
+	_LOADED = dict(loaded, full_graph = G)
+	GRAPH_CACHE.clear()
+
+def _ingest_rows(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+	if rows is None:
+		return df.iloc[:0]
+	missing = set(df.columns) - set(rows.columns)
+	if missing:
+		raise ValueError(f"Ingested rows are missing columns {sorted(missing)}")
+	return rows[df.columns].astype(df.dtypes.to_dict())
+
+def ingest(node_rows: pd.DataFrame = None, edge_rows: pd.DataFrame = None, recompute: bool = True) -> int:
+	"""
+	Applies appended node and edge rows to the live graph and publishes the result as a new snapshot, returning its version.
+	------------------
+	node_rows: New books, with the columns of get_node_df()
+	edge_rows: New co-purchases, with the columns of get_edge_df(). A pair that already has an edge takes the new weight,
+	as it would if the graph was rebuilt from the appended CSVs.
+	recompute: Recompute betweenness and closeness in the background and publish them as the next snapshot
+
+	Degree, degree centrality and clustering are updated from the nodes the new rows touch. Betweenness and closeness
+	keep their previous values (0 for new books) and G.graph['centrality']['stale'] is set until they are recomputed.
+	"""
+	with _INGEST_LOCK:
+		node_df, edge_df = get_node_df(), get_edge_df()
+		node_rows = _ingest_rows(node_df, node_rows)
+		edge_rows = _ingest_rows(edge_df, edge_rows)
+		centrality_df = get_centrality_df()
+		G = nx.Graph(generate_graph())
+
+		new_nodes = node_rows['id'].tolist()
+		if len(set(new_nodes)) != len(new_nodes) or any(node in G for node in new_nodes):
+			raise ValueError("Ingested books must have new, unique ids")
+		edges = list(zip(edge_rows['source'].tolist(), edge_rows['target'].tolist(), edge_rows['weight'].tolist()))
+		unknown = {node for source, target, _ in edges for node in (source, target)} - set(G) - set(new_nodes)
+		if unknown:
+			raise ValueError(f"Ingested co-purchases refer to unknown books {sorted(unknown)[:10]}")
+
+		G.add_nodes_from(zip(new_nodes, node_rows[NODE_ATTRIBUTES].to_dict('records')))
+		node_df = pd.concat([node_df, node_rows], ignore_index = True)
+		G.graph.update(node_df = node_df, node_index = pd.Index(node_df['id'].to_numpy()))
+		new_pairs = {(source, target) for source, target, _ in edges if not G.has_edge(source, target)}
+		G.add_weighted_edges_from(edges)
+
+		# New edges open and close triangles at their endpoints and at the endpoints' common neighbours
+		touched = set(new_nodes) | {node for source, target, _ in edges for node in (source, target)}
+		clustering_nodes = set(new_nodes)
+		for source, target in new_pairs:
+			clustering_nodes.update((source, target), set(G[source]) & set(G[target]))
+
+		centrality_df = centrality_df.reindex(list(G.nodes()))
+		estimated = ['betweenness_centrality', 'closeness_centrality', 'betweenness_error', 'closeness_error']
+		centrality_df[estimated] = centrality_df[estimated].fillna(0.0)
+		# Same scaling as nx.degree_centrality, which changes for every node when books are added
+		degree = pd.Series(dict(G.degree()), dtype = float)
+		centrality_df['degree_centrality'] = degree / (len(G) - 1) if len(G) > 1 else 1.0
+		if clustering_nodes:
+			clustering = nx.clustering(G, clustering_nodes)
+			centrality_df.loc[list(clustering), 'clustering_coefficient'] = pd.Series(clustering)
+		centrality_df.index.name = 'id'
+		centrality_df.attrs['centrality'] = dict(get_centrality_df().attrs.get('centrality') or {}, stale = True)
+
+		_compute_centrality_measures(G, centrality_df)
+		for node in touched:
+			G.nodes[node]['num_connections'] = len(G[node])
+
+		version = snapshot_version() + 1
+		_swap_snapshot({
+			'version': version,
+			'node_df': node_df,
+			'edge_df': pd.concat([edge_df, edge_rows], ignore_index = True),
+			'centrality_df': centrality_df
+		}, nx.freeze(G))
+
+	if recompute:
+		_RECOMPUTE_FUTURES.append(_RECOMPUTE_EXECUTOR.submit(_recompute_centrality, version))
+	return version
+
+def _recompute_centrality(version: int):
+	"""
+	Recomputes the centrality of the full graph of snapshot `version` and publishes it as the next snapshot,
+	unless a newer snapshot replaced it in the meantime.
+	"""
+	if snapshot_version() != version:
+		return
+	G = generate_graph()
+	centrality_df = centrality.compute_centrality(G)
 
-		edge_trace = go.Scatter(
-			x=[x0, x1, None], y=[y0, y1, None],
-			line=dict(width=np.log(data['weight']), color='#888'),
+	with _INGEST_LOCK:
+		if snapshot_version() != version:
+			return
+		G = _compute_centrality_measures(nx.Graph(G), centrality_df)
+		# Only centrality changed, everything derived from the frames stays valid
+		_swap_snapshot(dict(_LOADED, version = version + 1, centrality_df = centrality_df), nx.freeze(G))
+
+def wait_for_centrality(timeout: float = None):
+	"""
+	Blocks until the background centrality recomputations scheduled so far have finished.
+	"""
+	futures_wait(list(_RECOMPUTE_FUTURES), timeout = timeout)
+	_RECOMPUTE_FUTURES[:] = [future for future in _RECOMPUTE_FUTURES if not future.done()]
+
+EDGE_MODES = ('per_edge', 'bucketed', 'webgl')
+
+def _edge_width_buckets(widths: np.ndarray, n_buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	Groups edge widths into at most n_buckets line widths.
+	Returns the bucket of every edge and the width drawn for each bucket.
+	------------------
+	When there are no more distinct widths than buckets every edge keeps its exact width,
+	otherwise the width range is split evenly and each bucket is drawn at the mean width of its edges.
+	"""
+	unique_widths, buckets = np.unique(widths, return_inverse = True)
+	if len(unique_widths) <= n_buckets:
+		return buckets, unique_widths
+
+	boundaries = np.linspace(widths.min(), widths.max(), n_buckets + 1)
+	buckets = np.clip(np.searchsorted(boundaries, widths, side = 'right') - 1, 0, n_buckets - 1)
+	counts = np.bincount(buckets, minlength = n_buckets)
+	bucket_widths = np.bincount(buckets, weights = widths, minlength = n_buckets) / np.maximum(counts, 1)
+	return buckets, bucket_widths
+
+def _edge_traces(G: nx.Graph, pos: Dict, edge_mode: str = 'bucketed', n_buckets: int = 8) -> List:
+	"""
+	Returns the edge traces of plot_graph, with line width log(weight).
+	------------------
+	edge_mode: 'per_edge' draws one trace per edge with its exact width,
+	'bucketed' draws one NaN-separated trace per width bucket and 'webgl' draws the same buckets with Scattergl
+	"""
+	if edge_mode == 'per_edge':
+		return [
+			go.Scatter(
+				x=[pos[start][0], pos[end][0], None], y=[pos[start][1], pos[end][1], None],
+				line=dict(width=np.log(data['weight']), color='#888'),
+				hoverinfo='none',
+				mode='lines'
+			)
+			for start, end, data in G.edges(data = True)
+		]
+
+	if G.number_of_edges() == 0:
+		return []
+
+	node_index = {node: idx for idx, node in enumerate(G)}
+	coordinates = np.array([pos[node] for node in G], dtype = float)
+	edges = np.array([(node_index[start], node_index[end], weight) for start, end, weight in G.edges(data = 'weight')], dtype = float)
+	sources, targets = edges[:, 0].astype(int), edges[:, 1].astype(int)
+	buckets, bucket_widths = _edge_width_buckets(np.log(edges[:, 2]), n_buckets)
+
+	trace_type = go.Scattergl if edge_mode == 'webgl' else go.Scatter
+	traces = []
+	for bucket, width in enumerate(bucket_widths):
+		members = np.flatnonzero(buckets == bucket)
+		if not len(members):
+			continue
+		# Each edge is drawn as (source, target, NaN) so the segments of a bucket share one trace
+		segments = np.full((len(members), 3, 2), np.nan)
+		segments[:, 0] = coordinates[sources[members]]
+		segments[:, 1] = coordinates[targets[members]]
+		segments = segments.reshape(-1, 2)
+		traces.append(trace_type(
+			x=segments[:, 0], y=segments[:, 1],
+			line=dict(width=float(width), color='#888'),
 			hoverinfo='none',
-			mode='lines'
-		)
-		edge_traces.append(edge_trace)
-	
+			mode='lines',
+			connectgaps=False
+		))
+	return traces
 
-	node_x = []
-	node_y = []
-	for node in G.nodes():
-		x, y = pos[node]
-		node_x.append(x)
-		node_y.append(y)
+def _graph_figure(G: nx.Graph, pos: Dict, edge_mode: str = 'bucketed', n_buckets: int = 8) -> go.Figure:
+	nodes = list(G.nodes())
+	coordinates = np.array([pos[node] for node in nodes], dtype = float).reshape(-1, 2)
 
-	node_trace = go.Scatter(
-		x=node_x, y=node_y,
+	node_trace = (go.Scattergl if edge_mode == 'webgl' else go.Scatter)(
+		x=coordinates[:, 0], y=coordinates[:, 1],
 		mode='markers',
 		hoverinfo='text',
 		marker=dict(
@@ -601,15 +1026,16 @@ def plot_graph(G = networkGraph, params = None):
 
 	node_text = []
 
-	for node in G.nodes():
-		node_info = G.nodes()[node]
+	# Filtered graphs are views sharing the full graph's attributes, so connections are counted in G itself
+	node_adjacencies = [len(G[node]) for node in nodes]
+	for node, num_connections in zip(nodes, node_adjacencies):
+		node_info = dict(G.nodes()[node], num_connections = num_connections)
 		node_text.append("<br>".join([f"<b>{key}:</b> {value}" for key, value in node_info.items()]))
 
-	node_adjacencies = [G.nodes()[node]['num_connections'] for node in G]
 	node_trace.marker.color = node_adjacencies
 	node_trace.text = node_text
 
-	fig = go.Figure(data=edge_traces + [node_trace],
+	fig = go.Figure(data=_edge_traces(G, pos, edge_mode, n_buckets) + [node_trace],
 			 layout=go.Layout(
 				showlegend=False,
 				hovermode='closest',
@@ -626,6 +1052,50 @@ def plot_graph(G = networkGraph, params = None):
 		)
 	return fig
 
+def plot_graph(G = None, params = None, edge_mode:str = 'bucketed', n_buckets:int = 8):
+	"""
+	Returns a plotly figure of the graph drawn with a networkx layout.
+	------------------
+	edge_mode: One of EDGE_MODES. 'per_edge' gives every edge its own trace and exact width,
+	'bucketed' groups edges into n_buckets widths with one trace each, 'webgl' does the same with WebGL traces
+	"""
+	chart_type_option = 'spring'
+
+	if params:
+		chart_type_option = params.pop('chart_type_option')
+		valid_params = {key : value for key, value in params.items() if value}
+		G = generate_graph(filters = valid_params)
+	elif G is None:
+		G = generate_graph()
+
+	pos = layouts.compute_layout(G, chart_type_option, warm_start = get_full_graph())
+
+	return _graph_figure(G, pos, edge_mode, n_buckets)
+
+_HUB_RANKINGS = weakref.WeakKeyDictionary()
+
+def _hub_ranking(G:nx.Graph, n:int) -> List[int]:
+	"""
+	Returns the n highest-degree nodes, highest first. Ties rank later-added nodes first.
+	------------------------
+	The ranking of a frozen graph is kept and only recomputed, at least doubling in length,
+	when a longer one is asked for, so successive ranks never re-sort the whole degree list.
+	"""
+	def build():
+		length = max(n, 2 * len(_HUB_RANKINGS.get(G, ())))
+		return [node for node, _ in heapq.nlargest(length, reversed(list(G.degree())), key=itemgetter(1))]
+	return cache.per_frozen_graph(_HUB_RANKINGS, G, build, valid = lambda ranking: len(ranking) >= min(n, len(G)))[:n]
+
+def get_ego_networks(G:nx.Graph, n_ranks:int) -> List[Tuple[int, nx.Graph]]:
+	"""
+	Returns (ego_node, hub_ego) for ranks 1 to n_ranks from a single ranking pass.
+	Ranks beyond the number of nodes give (None, empty graph).
+	"""
+	ego_nodes = _hub_ranking(G, n_ranks)
+	ego_networks = [(ego_node, nx.ego_graph(G, ego_node)) for ego_node in ego_nodes]
+	ego_networks += [(None, nx.Graph()) for _ in range(n_ranks - len(ego_nodes))]
+	return ego_networks
+
 def get_ego_network(G:nx.Graph, rank:int):
 	"""
 	Returns information of nth rank ego-network.
@@ -635,24 +1105,24 @@ def get_ego_network(G:nx.Graph, rank:int):
 	pos: Dict[int, List[float, float]]
 
 	pos: Key of represents node connected to ego_node and the values are x-y coordinates.
+	Ranks start at 1, ranks beyond the number of nodes give (None, empty graph).
 	"""
-	node_and_degree = G.degree()
-	try:
-		(ego_node, _) = sorted(node_and_degree, key=itemgetter(1))[-1*rank]
+	if rank < 1:
+		raise ValueError(f"Ego network ranks start at 1, got {rank}")
+	ego_nodes = _hub_ranking(G, rank)
+	if len(ego_nodes) < rank:
+		ego_node, hub_ego = None, nx.Graph()
+	else:
+		ego_node = ego_nodes[rank - 1]
 		hub_ego = nx.ego_graph(G, ego_node)
-	except IndexError:
-		ego_node = None
-		hub_ego = nx.Graph()
 
-	pos = nx.spring_layout(hub_ego)
+	pos = layouts.compute_layout(hub_ego, 'spring')
 
 	return ego_node, hub_ego, pos
 
 def generate_cyto_ego_networks(G:nx.Graph, n_ranks:int) -> List[nx.Graph]:
 	ego_networks = []
-	for i in range(n_ranks):
-		ego_node, hub_ego, _ = get_ego_network(G, i+1)
-
+	for ego_node, hub_ego in get_ego_networks(G, n_ranks):
 		for node in hub_ego.nodes():
 			if node == ego_node:
 				hub_ego.nodes[node]['is_ego'] = True
@@ -670,12 +1140,12 @@ def get_ego_node_edge_traces(G:nx.Graph, n_ranks:int):
 	node_traces = []
 	edge_traces = []
 
-	for i in range(n_ranks):
+	for ego_node, hub_ego in get_ego_networks(G, n_ranks): # ego_node to be used to make it red
 		temp_node_x = []
 		temp_node_y = []
 		temp_edge_x = []
 		temp_edge_y = []
-		ego_node, hub_ego, pos = get_ego_network(G, i+1) # ego_node to be used to make it red
+		pos = layouts.compute_layout(hub_ego, 'spring')
 
 		for edge in hub_ego.edges():
 			x0, y0 = pos[edge[0]]
@@ -742,7 +1212,10 @@ def get_ego_node_edge_traces(G:nx.Graph, n_ranks:int):
 
 	return node_traces, edge_traces
 
-def generate_ego_network(n_ranks:int, G:nx.Graph = networkGraph):
+def generate_ego_network(n_ranks:int, G:nx.Graph = None):
+	G = generate_graph() if G is None else G
+	# Ranks past the number of nodes would only add empty figures
+	n_ranks = min(n_ranks, len(G))
 	node_traces, edge_traces = get_ego_node_edge_traces(G, n_ranks)
 
 	plotly_figures = []
@@ -768,94 +1241,220 @@ def generate_ego_network(n_ranks:int, G:nx.Graph = networkGraph):
 
 	return plotly_figures
 
-def plot_cyto_graph(G = networkGraph, params = None):
+# Callback values that change how the graph is drawn rather than which nodes it holds
+_DISPLAY_OPTIONS = ['centrality_scope', 'layout_engine', 'detail_limit', 'detail_metric', 'expanded_nodes']
+
+def _filter_params(params):
+	"""
+	Returns the callback values that filter the graph, dropping unset filters and display options.
+	"""
+	return {key : value for key, value in params.items() if value and key not in _DISPLAY_OPTIONS}
+
+def _graph_from_params(params):
+	return generate_graph(filters = _filter_params(params), local_centrality = params.get('centrality_scope') == 'subgraph')
+
+# networkx layout used for Cytoscape views drawn with the 'preset' layout
+CYTO_SERVER_LAYOUT = 'spring'
+# Pixels between neighbouring nodes, roughly, once positions are scaled by the square root of the node count
+_CYTO_NODE_SPACING = 60
+
+def _server_layout(params) -> bool:
+	return bool(params) and params.get('layout_engine') == 'server'
+
+def _add_cyto_positions(G: nx.Graph, elements: List[Dict]) -> List[Dict]:
+	"""
+	Sets the 'position' of every node element from the cached server-side layout of G,
+	so Cytoscape only has to render them with the 'preset' layout.
+	"""
+	pos = layouts.compute_layout(G, CYTO_SERVER_LAYOUT, warm_start = get_full_graph())
+	scale = _CYTO_NODE_SPACING * np.sqrt(len(G))
+	for element in elements:
+		if 'source' not in element['data']:
+			x, y = pos[int(element['data']['id'])]
+			element['position'] = {'x': round(float(x * scale), config.CYTO_FLOAT_PRECISION), 'y': round(float(y * scale), config.CYTO_FLOAT_PRECISION)}
+	return elements
+
+# Edge budget of the level of detail, per node it keeps
+_DETAIL_EDGES_PER_NODE = 3
+
+def _level_of_detail(G: nx.Graph, max_nodes: int, metric: str = 'degree_centrality', expanded_nodes = ()) -> Tuple[nx.Graph, List[Tuple[int, int, float]]]:
+	"""
+	Returns the view of G to draw within an element budget, and the (source, target, weight) edges to draw.
+	------------------
+	max_nodes: Nodes kept, those with the highest `metric` (ties go to nodes added first)
+	expanded_nodes: Nodes that were clicked open, they are kept along with all their neighbours
+	Edges are capped at a total of _DETAIL_EDGES_PER_NODE times the number of kept nodes, taking the strongest first,
+	so a single node can keep more than _DETAIL_EDGES_PER_NODE of them. Edges of expanded nodes are always drawn and use up the budget first.
+	"""
+	nodes = list(G.nodes())
+	values = np.array([G.nodes[node][metric] for node in nodes], dtype = float)
+	kept = {nodes[idx] for idx in np.argsort(-values, kind = 'stable')[:max_nodes]}
+
+	expanded = {int(node) for node in expanded_nodes or ()} & set(nodes)
+	for node in expanded:
+		kept.add(node)
+		kept.update(G[node])
+
+	H = G.subgraph(kept)
+	edges = list(H.edges.data('weight'))
+	max_edges = _DETAIL_EDGES_PER_NODE * len(kept)
+	if len(edges) > max_edges:
+		pinned = [edge for edge in edges if edge[0] in expanded or edge[1] in expanded]
+		others = [edge for edge in edges if edge[0] not in expanded and edge[1] not in expanded]
+		others = heapq.nlargest(max(max_edges - len(pinned), 0), others, key = itemgetter(2))
+		edges = pinned + others
+	return H, edges
+
+# Node attributes sent to Cytoscape after id and label, with the type they are sent as
+CYTO_NODE_FIELDS = [
+	('genre', int),
+	('sales_rank', int),
+	('avg_rating', float),
+	('num_reviews', int),
+	('num_pages', int),
+	('price', float),
+	('degree_centrality', float),
+	('betweenness_centrality', float),
+	('closeness_centrality', float)
+]
+
+def _cyto_node_data(G: nx.Graph, nodes: List[int], precision: int = None) -> List[Dict]:
+	"""
+	Cytoscape 'data' of the given nodes, taken by position from the node columns and G's centrality values.
+	Floats are rounded to `precision` decimals, config.CYTO_FLOAT_PRECISION by default.
+	"""
+	precision = config.CYTO_FLOAT_PRECISION if precision is None else precision
+	# Graphs not built here, e.g. ego networks of a copy, read the frames of the full graph
+	frames = G.graph if 'node_df' in G.graph and 'centrality_df' in G.graph else get_full_graph().graph
+	node_df, centrality_df = frames['node_df'], frames['centrality_df']
+	nodes = np.asarray(nodes, dtype = np.int64)
+	node_rows = frames['node_index'].get_indexer(nodes)
+	centrality_rows = centrality_df.index.get_indexer(nodes)
+	if (node_rows < 0).any() or (centrality_rows < 0).any():
+		raise KeyError(f"Nodes without attributes or centrality: {nodes[(node_rows < 0) | (centrality_rows < 0)][:10].tolist()}")
+
+	ids = nodes.astype(str).tolist()
+	columns = [ids, ids]
+	for name, kind in CYTO_NODE_FIELDS:
+		if name in node_df:
+			values = node_df[name].to_numpy()[node_rows]
+		else:
+			values = centrality_df[name].to_numpy()[centrality_rows]
+		columns.append(values.astype(np.int64).tolist() if kind is int else np.round(values.astype(float), precision).tolist())
+
+	keys = ['id', 'label'] + [name for name, _ in CYTO_NODE_FIELDS]
+	return [dict(zip(keys, row)) for row in zip(*columns)]
+
+def _cyto_edge_data(edge_data, precision: int = None) -> List[Dict]:
+	"""
+	Cytoscape 'data' of (source, target, weight) edges, drawn with width log(weight) rounded to `precision` decimals.
+	"""
+	precision = config.CYTO_FLOAT_PRECISION if precision is None else precision
+	edges = np.array(list(edge_data), dtype = float).reshape(-1, 3)
+	sources = edges[:, 0].astype(np.int64).astype(str).tolist()
+	targets = edges[:, 1].astype(np.int64).astype(str).tolist()
+	weights = np.round(np.log(edges[:, 2]), precision).tolist()
+	return [{'source': source, 'target': target, 'weight': weight} for source, target, weight in zip(sources, targets, weights)]
+
+def cyto_elements(G: nx.Graph, edge_data = None, node_data: Dict[int, Dict] = None, precision: int = None) -> List[Dict]:
+	"""
+	Returns Cytoscape elements of G's nodes followed by its edges.
+	------------------
+	edge_data: (source, target, weight) edges to draw, all of G's edges by default
+	node_data: Prebuilt 'data' by node, e.g. built once for nodes shared between panels
+	precision: Decimals kept for floats, config.CYTO_FLOAT_PRECISION by default
+	"""
+	nodes = list(G.nodes())
+	data = _cyto_node_data(G, nodes, precision) if node_data is None else [node_data[node] for node in nodes]
+	edge_data = G.edges.data('weight') if edge_data is None else edge_data
+	return [{'data': node} for node in data] + [{'data': edge} for edge in _cyto_edge_data(edge_data, precision)]
+
+def plot_cyto_graph(G = None, params = None, server_layout:bool = False, detail_limit:int = 0, detail_metric:str = 'degree_centrality', expanded_nodes = ()):
+	"""
+	Returns Cytoscape elements of the graph.
+	------------------
+	server_layout: Give every node a precomputed position for the 'preset' layout, set from params' layout_engine when given
+	detail_limit: Level of detail, only draw this many nodes ranked by detail_metric (and their strongest edges), 0 draws everything
+	expanded_nodes: With a detail_limit, nodes whose neighbours are drawn as well, e.g. after being clicked
+	"""
 	if params:
-		valid_params = {key : value for key, value in params.items() if value}
-		G = generate_graph(filters = valid_params)
+		server_layout = _server_layout(params)
+		detail_limit = params.get('detail_limit') or 0
+		detail_metric = params.get('detail_metric') or detail_metric
+		expanded_nodes = params.get('expanded_nodes') or ()
+		G = _graph_from_params(params)
+	elif G is None:
+		G = generate_graph()
 
-	elements = [{'data': {
-					'id': str(int(node_id)),
-					'label': str(int(node_id)),
-					'genre' : int(G.nodes[node_id]['genre']),
-					'sales_rank' : int(G.nodes[node_id]['sales_rank']),
-					'avg_rating' : float(G.nodes[node_id]['avg_rating']),
-					'num_reviews' : int(G.nodes[node_id]['num_reviews']),
-					'num_pages' : int(G.nodes[node_id]['num_pages']),
-					'price' : float(G.nodes[node_id]['price']),
-					'degree_centrality': float(G.nodes[node_id]['degree_centrality']),
-					'betweenness_centrality': float(G.nodes[node_id]['betweenness_centrality']),
-					'closeness_centrality': float(G.nodes[node_id]['closeness_centrality']),
-					}
-				} for node_id in G.nodes()]
-	edges = [{'data' : {'source' : str(int(source)), 'target' : str(int(target)), 'weight' : np.log(weight)}} for source, target, weight in G.edges.data("weight")]
-	
-	return elements + edges
+	edge_data = G.edges.data("weight")
+	if detail_limit:
+		G, edge_data = _level_of_detail(G, detail_limit, detail_metric, expanded_nodes)
+
+	elements = cyto_elements(G, edge_data)
+
+	if server_layout:
+		_add_cyto_positions(G, elements)
+	return elements
 
-def plot_cyto_ego_graphs(G = networkGraph, params = None):
+def plot_cyto_ego_graphs(G = None, params = None, server_layout:bool = False):
 	if params:
-		valid_params = {key : value for key, value in params.items() if value}
-		G = generate_graph(filters = valid_params)
+		server_layout = _server_layout(params)
+		G = _graph_from_params(params)
+	elif G is None:
+		G = generate_graph()
+
+	ego_networks = get_ego_networks(G, 3)
 
-	ego_graph_list = generate_cyto_ego_networks(G, 3)
-	# To update to show 3
+	# Ego networks overlap, so the data of each node is built once for all panels
+	nodes = list(dict.fromkeys(node for _, hub_ego in ego_networks for node in hub_ego))
+	node_data = dict(zip(nodes, _cyto_node_data(G, nodes)))
 
 	graph_elements = []
-	for eg_graph in ego_graph_list:
-
-		elements = [{'data': {
-						'id': str(int(node_id)),
-						'label': str(int(node_id)),
-						'genre' : int(eg_graph.nodes[node_id]['genre']),
-						'sales_rank' : int(eg_graph.nodes[node_id]['sales_rank']),
-						'avg_rating' : float(eg_graph.nodes[node_id]['avg_rating']),
-						'num_reviews' : int(eg_graph.nodes[node_id]['num_reviews']),
-						'num_pages' : int(eg_graph.nodes[node_id]['num_pages']),
-						'price' : float(eg_graph.nodes[node_id]['price']),
-						'is_ego': eg_graph.nodes[node_id]['is_ego'],
-						'degree_centrality': float(G.nodes[node_id]['degree_centrality']),
-						'betweenness_centrality': float(G.nodes[node_id]['betweenness_centrality']),
-						'closeness_centrality': float(G.nodes[node_id]['closeness_centrality']),
-						}
-					} for node_id in eg_graph.nodes()]
-		edges = [{'data' : {'source' : str(int(source)), 'target' : str(int(target)), 'weight' : np.log(weight)}} for source, target, weight in eg_graph.edges.data('weight')]
-
-		graph_elements.append(elements + edges)
+	for ego_node, hub_ego in ego_networks:
+		ego_node_data = {node: dict(node_data[node], is_ego = node == ego_node) for node in hub_ego}
+		elements = cyto_elements(hub_ego, node_data = ego_node_data)
+
+		if server_layout:
+			_add_cyto_positions(hub_ego, elements)
+		graph_elements.append(elements)
 
 	return graph_elements
 
-def plot_cyto_nclique_graph(G = networkGraph, params = None):
+def plot_cyto_nclique_graph(G = None, params = None, subgraph_view:bool = True, server_layout:bool = False):
+	"""
+	Returns Cytoscape elements of the nodes that belong to a maximal clique of the selected size.
+	------------------
+	subgraph_view: Draw an induced view of the already built graph, keeping its attributes.
+	Otherwise the clique nodes' graph is rebuilt through generate_graph, recomputing subgraph-local centrality on it.
+	server_layout: As in plot_cyto_graph
+	"""
 	nclique_value = 3
 	valid_params = {}
+	local_centrality = False
 	if params:
 		if 'nclique_filter' in params:
 			nclique_value = helpers.clique_sizes()[int(params.pop('nclique_filter'))]
-		valid_params = {key : value for key, value in params.items() if value}
-		G = generate_graph(filters = valid_params)
-
-	# Dictionary with information of each maximal clique based on value of n in n-clique
-	clique_graph_table_info = generate_clique_metrics(G, nclique_value)
-
-	clique_nodes_list = [item['nodes'] for item in clique_graph_table_info]
-	flatten_node_list = list(set([node for clique in clique_nodes_list for node in clique]))
-	G = generate_graph(filters = valid_params, nodelist = flatten_node_list)
-
-	elements = [{'data': {
-					'id': str(int(node_id)),
-					'label': str(int(node_id)),
-					'genre' : int(G.nodes[node_id]['genre']),
-					'sales_rank' : int(G.nodes[node_id]['sales_rank']),
-					'avg_rating' : float(G.nodes[node_id]['avg_rating']),
-					'num_reviews' : int(G.nodes[node_id]['num_reviews']),
-					'num_pages' : int(G.nodes[node_id]['num_pages']),
-					'price' : float(G.nodes[node_id]['price']),
-					'degree_centrality': float(G.nodes[node_id]['degree_centrality']),
-					'betweenness_centrality': float(G.nodes[node_id]['betweenness_centrality']),
-					'closeness_centrality': float(G.nodes[node_id]['closeness_centrality']),
-					}
-				} for node_id in G.nodes()]
-	edges = [{'data' : {'source' : str(int(source)), 'target' : str(int(target)), 'weight' : np.log(weight)}} for source, target, weight in G.edges.data('weight')]
-
-	return elements + edges
+		local_centrality = params.get('centrality_scope') == 'subgraph'
+		server_layout = _server_layout(params)
+		valid_params = _filter_params(params)
+		G = generate_graph(filters = valid_params, local_centrality = local_centrality)
+	elif G is None:
+		G = generate_graph()
+
+	# Maximal cliques based on value of n in n-clique
+	cliques = get_clique_index(G).get(nclique_value)
+	flatten_node_list = np.unique(cliques).tolist() if cliques is not None else []
+
+	if subgraph_view:
+		G = G.subgraph(flatten_node_list)
+	else:
+		G = generate_graph(filters = valid_params, nodelist = flatten_node_list, local_centrality = local_centrality)
+
+	elements = cyto_elements(G)
+
+	if server_layout:
+		_add_cyto_positions(G, elements)
+	return elements
 
 def include_loader(graph_component):
 	return dcc.Loading(type = "cube", color = "#36454f", children = [graph_component])
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+Binary columnar cache for the data/ CSVs.
+------------------
+The first load parses the CSV and writes one .npy file per column under config.CACHE_DIR.
+Later loads memory-map those files read-only, so every worker process shares the same pages
+instead of re-parsing the CSV. The cache is checked against the CSV's size and mtime, and a
+changed mtime only triggers a rebuild when the file's SHA-1 digest changed too.
+"""
+import json
+import os
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+import config
+import helpers
+
+def _column_dir(csv_path: str) -> str:
+	name = os.path.splitext(os.path.basename(csv_path))[0]
+	return os.path.join(config.CACHE_DIR, 'columns', name)
+
+def _read_meta(directory: str) -> Dict:
+	try:
+		with open(os.path.join(directory, 'meta.json')) as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return None
+
+def _write_meta(directory: str, meta: Dict):
+	helpers.write_atomic(os.path.join(directory, 'meta.json'), lambda f: f.write(json.dumps(meta).encode()))
+
+def _write_columns(directory: str, df: pd.DataFrame, stat: os.stat_result, digest: str) -> Dict:
+	os.makedirs(directory, exist_ok=True)
+	for idx, column in enumerate(df.columns):
+		values = df[column].values
+		# Object columns can't be memory-mapped, store them as fixed-width strings
+		if values.dtype == object:
+			values = values.astype(str)
+		helpers.write_atomic(os.path.join(directory, f"{idx}.npy"), lambda f: np.save(f, values, allow_pickle=False))
+
+	meta = {
+		'size': stat.st_size,
+		'mtime_ns': stat.st_mtime_ns,
+		'digest': digest,
+		'columns': [str(column) for column in df.columns]
+	}
+	_write_meta(directory, meta)
+	return meta
+
+def load_columns(csv_path: str, parse: Callable[[str], pd.DataFrame]) -> Dict[str, np.ndarray]:
+	"""
+	Returns the CSV's columns as read-only memory-mapped arrays, keyed by column name in file order.
+	parse turns the CSV into a DataFrame and only runs when the cache is missing or stale.
+	"""
+	directory = _column_dir(csv_path)
+	meta = _read_meta(directory)
+	stat = os.stat(csv_path)
+
+	if meta is None or (meta['size'], meta['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+		digest = helpers.file_digest(csv_path)
+		if meta is not None and meta['digest'] == digest:
+			# Touched but unchanged, only the recorded mtime is out of date
+			meta.update(size = stat.st_size, mtime_ns = stat.st_mtime_ns)
+			_write_meta(directory, meta)
+		else:
+			meta = _write_columns(directory, parse(csv_path), stat, digest)
+
+	return {
+		column: np.load(os.path.join(directory, f"{idx}.npy"), mmap_mode='r', allow_pickle=False)
+		for idx, column in enumerate(meta['columns'])
+	}
@@ -0,0 +1,39 @@
+"""
+Runtime configuration.
+Every setting can be overridden with an environment variable of the same name.
+"""
+import os
+
+# Memory budget (in bytes) for filtered graphs kept by charts.GRAPH_CACHE
+GRAPH_CACHE_MAX_BYTES = int(os.environ.get('GRAPH_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Directory for files derived from the data/ CSVs, such as the precomputed centrality store
+CACHE_DIR = os.environ.get('CACHE_DIR', 'data/cache')
+
+# How betweenness centrality is computed: 'exact', 'sampled' (CENTRALITY_SAMPLES pivot sources)
+# or 'adaptive' (as many pivots as fit in CENTRALITY_TIME_BUDGET seconds)
+CENTRALITY_MODE = os.environ.get('CENTRALITY_MODE', 'exact')
+CENTRALITY_SAMPLES = int(os.environ.get('CENTRALITY_SAMPLES', 256))
+CENTRALITY_TIME_BUDGET = float(os.environ.get('CENTRALITY_TIME_BUDGET', 2.0))
+CENTRALITY_SEED = int(os.environ.get('CENTRALITY_SEED', 0))
+
+# Worker processes for centrality computation, 1 computes serially in the Dash worker
+CENTRALITY_WORKERS = int(os.environ.get('CENTRALITY_WORKERS', 1))
+
+# Load the data and global centrality in a background thread as soon as the server starts
+WARM_UP = os.environ.get('WARM_UP', '1') == '1'
+
+# Memory budget (in bytes) for layout positions kept by layouts.LAYOUT_CACHE, and whether they are also written to CACHE_DIR
+LAYOUT_CACHE_MAX_BYTES = int(os.environ.get('LAYOUT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+LAYOUT_CACHE_DISK = os.environ.get('LAYOUT_CACHE_DISK', '0') == '1'
+LAYOUT_SEED = int(os.environ.get('LAYOUT_SEED', 0))
+
+# Decimals kept for floats sent to Cytoscape (node attributes, edge widths and positions)
+CYTO_FLOAT_PRECISION = int(os.environ.get('CYTO_FLOAT_PRECISION', 6))
+
+# Number of recent stats table filter strings whose matching rows are cached
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 128))
+
+# Bytes of single-source shortest path trees kept by paths.PathService, and the landmarks its distance estimates use
+PATH_CACHE_MAX_BYTES = int(os.environ.get('PATH_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+PATH_LANDMARKS = int(os.environ.get('PATH_LANDMARKS', 16))
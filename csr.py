@@ -0,0 +1,252 @@
+"""
+Compact array-backed graph core for analytics on large co-purchase graphs.
+------------------
+CSRGraph keeps an undirected weighted graph as compressed sparse row arrays: the neighbours of the node
+at position i are indices[indptr[i]:indptr[i + 1]], sorted, with their edge weights alongside. Node ids
+and attributes are stored column-wise. Traversals work a whole BFS level at a time on these arrays,
+and to_networkx exports a graph (or part of one) for the code that still needs networkx.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+# Neighbour pairs checked at once by clustering, bounding its temporary arrays
+_WEDGE_CHUNK = 1 << 22
+
+class CSRGraph:
+	"""
+	Undirected weighted graph in compressed sparse row form. Self-loops are dropped.
+	------------------
+	nodes: Node ids, the position of a node is its index here
+	indptr, indices, weights: Row offsets, sorted neighbour positions and edge weights, every edge stored in both directions
+	node_attributes: Column name to array of values, one per node
+	"""
+	def __init__(self, nodes: np.ndarray, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray, node_attributes: Dict[str, np.ndarray] = None):
+		self.nodes = nodes
+		self.indptr = indptr
+		self.indices = indices
+		self.weights = weights
+		self.node_attributes = node_attributes or {}
+		self._order = np.argsort(nodes, kind = 'stable')
+		self._lists = None
+
+	@classmethod
+	def _from_edges(cls, nodes: np.ndarray, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray, node_attributes: Dict[str, np.ndarray]) -> 'CSRGraph':
+		"""
+		Builds the arrays from an edge list over known node ids. A repeated pair keeps its last weight, as in networkx.
+		"""
+		graph = cls(nodes, None, None, None, node_attributes)
+		n = len(nodes)
+		u, v = graph.positions(sources), graph.positions(targets)
+		weights = np.asarray(weights, dtype = float)
+		loops = u == v
+		u, v, weights = u[~loops], v[~loops], weights[~loops]
+
+		low, high = np.minimum(u, v), np.maximum(u, v)
+		keys = low * n + high
+		# np.unique keeps the first occurrence, so search the reversed list for the last one
+		_, last = np.unique(keys[::-1], return_index = True)
+		last = len(keys) - 1 - last
+		low, high, weights = low[last], high[last], weights[last]
+
+		rows = np.concatenate((low, high))
+		columns = np.concatenate((high, low))
+		order = np.lexsort((columns, rows))
+		index_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+		graph.indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength = n)))).astype(np.int64)
+		graph.indices = columns[order].astype(index_dtype)
+		graph.weights = np.concatenate((weights, weights))[order]
+		return graph
+
+	@classmethod
+	def from_frames(cls, node_df: pd.DataFrame, edge_df: pd.DataFrame) -> 'CSRGraph':
+		"""
+		Builds the graph from the node and edge columns, like charts._graph_from_frames.
+		Edge endpoints missing from node_df are added after its rows, with NaN attributes.
+		"""
+		ids = node_df['id'].to_numpy(dtype = np.int64)
+		sources = edge_df['source'].to_numpy(dtype = np.int64)
+		targets = edge_df['target'].to_numpy(dtype = np.int64)
+
+		endpoints = pd.unique(np.column_stack((sources, targets)).ravel())
+		missing = endpoints[~np.isin(endpoints, ids)]
+		nodes = np.concatenate((ids, missing)).astype(np.int64)
+		attributes = node_df if not len(missing) else node_df.set_index('id', drop = False).reindex(nodes)
+		node_attributes = {column: attributes[column].to_numpy() for column in node_df.columns}
+
+		return cls._from_edges(nodes, sources, targets, edge_df['weight'].to_numpy(), node_attributes)
+
+	@classmethod
+	def from_networkx(cls, G: nx.Graph, attributes: List[str] = ()) -> 'CSRGraph':
+		"""
+		Builds the graph from a networkx graph, keeping its node order and the named node attributes.
+		"""
+		nodes = np.array(list(G), dtype = np.int64)
+		edges = np.array(list(G.edges(data = 'weight', default = 1.0)), dtype = float).reshape(-1, 3)
+		node_attributes = {attribute: np.array([data.get(attribute) for _, data in G.nodes(data = True)]) for attribute in attributes}
+		return cls._from_edges(nodes, edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64), edges[:, 2], node_attributes)
+
+	def to_networkx(self, positions: np.ndarray = None) -> nx.Graph:
+		"""
+		Exports the graph, or the subgraph induced by the given node positions, with its node attributes and edge weights.
+		"""
+		graph = self if positions is None else self.subgraph(positions)
+		G = nx.Graph()
+		columns = {column: values.tolist() for column, values in graph.node_attributes.items()}
+		G.add_nodes_from((node, {column: values[idx] for column, values in columns.items()}) for idx, node in enumerate(graph.nodes.tolist()))
+
+		rows = np.repeat(np.arange(len(graph)), np.diff(graph.indptr))
+		upper = rows < graph.indices
+		G.add_weighted_edges_from(zip(graph.nodes[rows[upper]].tolist(), graph.nodes[graph.indices[upper]].tolist(), graph.weights[upper].tolist()))
+		return G
+
+	def __len__(self) -> int:
+		return len(self.nodes)
+
+	def number_of_edges(self) -> int:
+		return len(self.indices) // 2
+
+	@property
+	def nbytes(self) -> int:
+		"""
+		Bytes held by the adjacency, weight and node arrays, not counting object columns' values.
+		"""
+		arrays = [self.nodes, self.indptr, self.indices, self.weights, self._order] + list(self.node_attributes.values())
+		return sum(array.nbytes for array in arrays)
+
+	def positions(self, nodes) -> np.ndarray:
+		"""
+		Positions of the given node ids. Raises KeyError when one isn't in the graph.
+		"""
+		nodes = np.asarray(nodes, dtype = np.int64)
+		if not len(self.nodes):
+			if len(nodes):
+				raise KeyError(f"Nodes not in the graph: {nodes[:10].tolist()}")
+			return nodes
+		found = np.minimum(np.searchsorted(self.nodes, nodes, sorter = self._order), len(self.nodes) - 1)
+		positions = self._order[found]
+		missing = self.nodes[positions] != nodes
+		if missing.any():
+			raise KeyError(f"Nodes not in the graph: {nodes[missing][:10].tolist()}")
+		return positions
+
+	def degree(self) -> np.ndarray:
+		return np.diff(self.indptr)
+
+	def neighbors(self, node) -> np.ndarray:
+		position = self.positions([node])[0]
+		return self.nodes[self.indices[self.indptr[position]:self.indptr[position + 1]]]
+
+	def adjacency_lists(self) -> Tuple[List[int], List[int]]:
+		"""
+		indptr and indices as Python lists, which per-node loops index much faster than arrays. Built once per graph.
+		"""
+		if self._lists is None:
+			self._lists = (self.indptr.tolist(), self.indices.tolist())
+		return self._lists
+
+	def _slots(self, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		Indices into self.indices of every neighbour of the frontier positions, row by row, and each row's length.
+		"""
+		starts = self.indptr[frontier]
+		counts = self.indptr[frontier + 1] - starts
+		offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+		return offsets + np.arange(len(offsets)), counts
+
+	def bfs(self, source, cutoff: int = None) -> np.ndarray:
+		"""
+		Hop distance from the source node to every position, -1 where unreached (or beyond cutoff).
+		"""
+		distance = np.full(len(self), -1, dtype = np.int64)
+		frontier = self.positions([source])
+		distance[frontier] = 0
+		level = 0
+		while len(frontier) and (cutoff is None or level < cutoff):
+			neighbours = self.indices[self._slots(frontier)[0]]
+			frontier = np.unique(neighbours[distance[neighbours] < 0])
+			level += 1
+			distance[frontier] = level
+		return distance
+
+	def subgraph(self, positions: np.ndarray) -> 'CSRGraph':
+		"""
+		Graph induced by the given node positions, kept in position order.
+		"""
+		positions = np.unique(np.asarray(positions, dtype = np.int64))
+		remap = np.full(len(self), -1, dtype = np.int64)
+		remap[positions] = np.arange(len(positions))
+
+		slots, counts = self._slots(positions)
+		rows = np.repeat(np.arange(len(positions)), counts)
+		columns = remap[self.indices[slots]]
+		kept = columns >= 0
+		indptr = np.concatenate(([0], np.cumsum(np.bincount(rows[kept], minlength = len(positions))))).astype(np.int64)
+		node_attributes = {column: values[positions] for column, values in self.node_attributes.items()}
+		return CSRGraph(self.nodes[positions], indptr, columns[kept].astype(self.indices.dtype), self.weights[slots][kept], node_attributes)
+
+	def ego(self, node, radius: int = 1) -> 'CSRGraph':
+		"""
+		Graph induced by the nodes within radius hops of node, like nx.ego_graph.
+		"""
+		return self.subgraph(np.flatnonzero(self.bfs(node, cutoff = radius) >= 0))
+
+	def components(self) -> np.ndarray:
+		"""
+		Connected component of every position, labelled by its smallest position.
+		Each round takes the smallest label among a node's neighbours, then follows labels to their own label.
+		"""
+		rows = np.repeat(np.arange(len(self)), self.degree())
+		labels = np.arange(len(self))
+		while True:
+			smallest = labels.copy()
+			np.minimum.at(smallest, rows, labels[self.indices])
+			smallest = smallest[smallest]
+			if np.array_equal(smallest, labels):
+				return labels
+			labels = smallest
+
+	def degree_centrality(self) -> np.ndarray:
+		if len(self) <= 1:
+			return np.ones(len(self))
+		return self.degree() / (len(self) - 1)
+
+	def triangles(self) -> np.ndarray:
+		"""
+		Number of triangles through each node, from every pair of neighbours that is itself an edge.
+		"""
+		n = len(self)
+		degree = self.degree()
+		rows = np.repeat(np.arange(n), degree)
+		# Each slot pairs with the later slots of its row
+		pairs_per_slot = np.maximum(self.indptr[rows + 1] - np.arange(len(self.indices)) - 1, 0)
+		edge_keys = rows * n + self.indices
+
+		triangles = np.zeros(n, dtype = np.int64)
+		ends = np.cumsum(pairs_per_slot)
+		start_slot = 0
+		while start_slot < len(self.indices):
+			base = ends[start_slot - 1] if start_slot else 0
+			end_slot = int(np.searchsorted(ends, base + _WEDGE_CHUNK, side = 'right'))
+			end_slot = max(end_slot, start_slot + 1)
+
+			counts = pairs_per_slot[start_slot:end_slot]
+			first = np.repeat(np.arange(start_slot, end_slot), counts)
+			second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+			keys = self.indices[first].astype(np.int64) * n + self.indices[second]
+			found = np.minimum(np.searchsorted(edge_keys, keys), len(edge_keys) - 1)
+			closed = edge_keys[found] == keys
+			triangles += np.bincount(rows[first[closed]], minlength = n)
+			start_slot = end_slot
+		return triangles
+
+	def clustering(self) -> np.ndarray:
+		"""
+		Unweighted clustering coefficient of each node, as nx.clustering.
+		"""
+		degree = self.degree()
+		wedges = degree * (degree - 1)
+		with np.errstate(divide = 'ignore', invalid = 'ignore'):
+			return np.where(wedges > 0, 2 * self.triangles() / np.maximum(wedges, 1), 0.0)
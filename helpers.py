@@ -1,35 +1,29 @@
-import numpy as np
-
-# Filtering functions
-operators = [['ge ', '>='],
-             ['le ', '<='],
-             ['lt ', '<'],
-             ['gt ', '>'],
-             ['ne ', '!='],
-             ['eq ', '='],
-             ['contains '],
-             ['datestartswith ']]
-
-def split_filter_part(filter_part):
-    for operator_type in operators:
-        for operator in operator_type:
-            if operator in filter_part:
-                name_part, value_part = filter_part.split(operator, 1)
-                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+import hashlib
+import os
 
-                value_part = value_part.strip()
-                v0 = value_part[0]
-                if (v0 == value_part[-1] and v0 in ("'", '"', '`')):
-                    value = value_part[1: -1].replace('\\' + v0, v0)
-                else:
-                    try:
-                        value = float(value_part)
-                    except ValueError:
-                        value = value_part
+import numpy as np
 
-                return name, operator_type[0].strip(), value
+# File functions
+def file_digest(*paths, chunk_size=1 << 20):
+    """
+    Returns a SHA-1 hex digest over the contents of all given files, in order.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
 
-    return [None] * 3
+def write_atomic(path, write):
+    """
+    Calls write(f) on a temporary file next to path, then renames it over path,
+    so readers in other processes see either the old file or the complete new one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
 
 
 # Styling functions
@@ -55,6 +49,10 @@ def network_layout_options():
 def clique_sizes():
     return [2, 3, 4, 5]
 
+def detail_limits():
+    # Node budgets of the Overall graph's level of detail, 0 draws every node
+    return [0, 25, 50, 100, 250]
+
 def data_attributes():
     return ['genre', 'avg_rating']
 
@@ -87,6 +85,6 @@ def _generate_node_edge_info(node_data, edge_data):
             You recently hovered over the edge:
             Source: {edge_data['source']}
             Target: {edge_data['target']}
-            Frequency: {int(np.exp(edge_data['weight']))}
+            Frequency: {int(round(np.exp(edge_data['weight'])))}
             """
     return para
\ No newline at end of file
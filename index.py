@@ -1,9 +1,19 @@
+import time
+
+# Reference point for the cold-start timings reported by /ready
+STARTED_AT = time.perf_counter()
+
+import threading
+
 import dash_core_components as dcc
 import dash_html_components as html
 import plotly.graph_objs as go
 from dash.dependencies import Input, Output
+from flask import jsonify, request
 
 import charts
+import config
+import layouts
 import statistics
 import visualise
 import network
@@ -56,7 +66,37 @@ def show_content(page):
         "/visualise" : visualise.content,
         "/network": network.content,
     }
-    return [path_map[page]]
+    return [path_map[page]()]
+
+startup_timings = {}
+
+def _warm_up():
+    charts.warm_up()
+    startup_timings['warm_up_seconds'] = time.perf_counter() - STARTED_AT
+
+if config.WARM_UP:
+    threading.Thread(target = _warm_up, name = "warm-up", daemon = True).start()
+
+@app.server.after_request
+def record_first_request(response):
+    # Readiness probes don't count as served traffic
+    if 'first_request_seconds' not in startup_timings and request.path != '/ready':
+        startup_timings['first_request_seconds'] = time.perf_counter() - STARTED_AT
+        app.logger.info(f"Cold start: first request served after {startup_timings['first_request_seconds']:.2f}s")
+    return response
+
+@app.server.route('/ready')
+def ready():
+    status = dict(startup_timings, ready = charts.is_ready(), snapshot = charts.snapshot_status())
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.server.route('/cache-stats')
+def cache_stats():
+    return jsonify({
+        'graph': charts.graph_cache_stats(),
+        'layout': layouts.layout_cache_stats(),
+        'stats_query': charts.stats_query_cache_stats()
+    })
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+"""
+Cached graph layouts.
+------------------
+Positions are kept in an LRU cache keyed on (graph fingerprint, layout name, seed, warm-start fingerprint), and also written
+under config.CACHE_DIR when config.LAYOUT_CACHE_DISK is set. The iterative layouts (spring and
+Kamada-Kawai) can be warm-started from the layout of a source graph sharing most of the nodes, e.g. the
+unfiltered graph when a filter is applied, so they converge in fewer iterations.
+"""
+import hashlib
+import os
+import weakref
+from typing import Dict, Tuple
+
+import numpy as np
+import networkx as nx
+
+import cache
+import config
+import helpers
+
+# Iterations of the spring layout when started from cached positions instead of random ones
+WARM_START_ITERATIONS = 15
+
+def _spring(G: nx.Graph, seed: int, pos: Dict = None) -> Dict:
+	if pos is None:
+		return nx.spring_layout(G, seed = seed)
+	return nx.spring_layout(G, pos = pos, iterations = WARM_START_ITERATIONS, seed = seed)
+
+def _kamada_kawai(G: nx.Graph, seed: int, pos: Dict = None) -> Dict:
+	return nx.kamada_kawai_layout(G, pos = pos)
+
+LAYOUTS = {
+	'circular' : lambda g, seed, pos : nx.circular_layout(g),
+	'kamada-kawai' : _kamada_kawai,
+	'random' : lambda g, seed, pos : nx.random_layout(g, seed = seed),
+	'shell' : lambda g, seed, pos : nx.shell_layout(g),
+	'spring' : _spring,
+	'spectral' : lambda g, seed, pos : nx.spectral_layout(g)
+}
+
+# Layouts that improve on their initial positions, the others ignore them
+WARM_START_LAYOUTS = ['spring', 'kamada-kawai']
+
+def _sizeof_layout(layout: Tuple[np.ndarray, np.ndarray]) -> int:
+	nodes, positions = layout
+	return nodes.nbytes + positions.nbytes
+
+LAYOUT_CACHE = cache.LRUCache(config.LAYOUT_CACHE_MAX_BYTES, sizeof = _sizeof_layout)
+
+_FINGERPRINTS = weakref.WeakKeyDictionary()
+
+def graph_fingerprint(G: nx.Graph) -> str:
+	"""
+	SHA-1 of the graph's nodes, edges and edge weights, independent of insertion order.
+	"""
+	def build():
+		nodes = np.sort(np.array(list(G.nodes()), dtype = np.int64))
+		edges = np.array([(min(u, v), max(u, v), weight) for u, v, weight in G.edges(data = 'weight', default = 1)], dtype = float).reshape(-1, 3)
+		edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+
+		digest = hashlib.sha1()
+		digest.update(nodes.tobytes())
+		digest.update(edges.tobytes())
+		return digest.hexdigest()
+	return cache.per_frozen_graph(_FINGERPRINTS, G, build)
+
+def layout_path(fingerprint: str, name: str, seed: int, source: str = '') -> str:
+	suffix = f"-from-{source}" if source else ''
+	return os.path.join(config.CACHE_DIR, 'layouts', f"{fingerprint}-{name}-{seed}{suffix}.npz")
+
+def _load_layout(path: str) -> Tuple[np.ndarray, np.ndarray]:
+	try:
+		with np.load(path, allow_pickle = False) as store:
+			nodes, positions = store['nodes'], store['positions']
+	except (OSError, KeyError, ValueError):
+		return None
+	positions.setflags(write = False)
+	return nodes, positions
+
+def _save_layout(path: str, layout: Tuple[np.ndarray, np.ndarray]):
+	os.makedirs(os.path.dirname(path), exist_ok = True)
+	helpers.write_atomic(path, lambda f: np.savez(f, nodes = layout[0], positions = layout[1]))
+
+def _warm_start_positions(G: nx.Graph, source: nx.Graph, name: str, seed: int) -> Dict:
+	"""
+	Initial positions from the layout of source with the same name and seed, computed first on a miss.
+	Nodes source doesn't have start at the mean position of their placed neighbours, or at random.
+	"""
+	source_nodes, positions = _get_layout(source, name, seed)
+	pos = {node: position for node, position in zip(source_nodes.tolist(), positions) if node in G}
+	if not pos:
+		return None
+	rng = np.random.RandomState(seed)
+	for node in G:
+		if node not in pos:
+			placed = [pos[neighbour] for neighbour in G[node] if neighbour in pos]
+			pos[node] = np.mean(placed, axis = 0) if placed else rng.uniform(-1, 1, 2)
+	return pos
+
+def _get_layout(G: nx.Graph, name: str, seed: int, warm_start: nx.Graph = None) -> Tuple[np.ndarray, np.ndarray]:
+	fingerprint = graph_fingerprint(G)
+	source = graph_fingerprint(warm_start) if warm_start is not None and name in WARM_START_LAYOUTS else ''
+	if source == fingerprint:
+		source = ''
+	key = (fingerprint, name, seed, source)
+	layout = LAYOUT_CACHE.get(key)
+	if layout is None and config.LAYOUT_CACHE_DISK:
+		layout = _load_layout(layout_path(*key))
+		if layout is not None:
+			LAYOUT_CACHE.put(key, layout)
+
+	if layout is None:
+		pos = _warm_start_positions(G, warm_start, name, seed) if source else None
+		pos = LAYOUTS[name](G, seed, pos)
+		nodes = list(pos)
+		layout = (np.array(nodes, dtype = np.int64), np.array([pos[node] for node in nodes], dtype = float))
+		# Callers share the cached positions
+		layout[1].setflags(write = False)
+		LAYOUT_CACHE.put(key, layout)
+		if config.LAYOUT_CACHE_DISK:
+			_save_layout(layout_path(*key), layout)
+	return layout
+
+def compute_layout(G: nx.Graph, name: str = 'spring', seed: int = None, warm_start: nx.Graph = None) -> Dict:
+	"""
+	Returns {node: array([x, y])} of the named layout, computing and caching it on a miss.
+	------------------
+	name: One of LAYOUTS
+	seed: Random state of the layout, defaults to config.LAYOUT_SEED
+	warm_start: Graph sharing most of G's nodes, e.g. the full graph, whose layout starts spring and Kamada-Kawai.
+	Its layout is computed first if it isn't cached, so the result only depends on G, warm_start, name and seed.
+	"""
+	seed = config.LAYOUT_SEED if seed is None else seed
+	if len(G) == 0:
+		return {}
+	nodes, positions = _get_layout(G, name, seed, warm_start)
+	return dict(zip(nodes.tolist(), positions))
+
+def layout_cache_stats() -> Dict[str, int]:
+	return LAYOUT_CACHE.stats()
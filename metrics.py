@@ -2,9 +2,13 @@ from typing import List
 from typing import Dict
 from typing import Set
 from typing import Tuple
+from typing import Iterator
+from typing import Union
 
 import networkx as nx
 
+import paths
+
 
 def _compute_articulation_points(G: nx.Graph) -> List[int]:
 	"""
@@ -15,7 +19,7 @@ def _compute_articulation_points(G: nx.Graph) -> List[int]:
 	
 	return articulation_points
 
-def _compute_biconnected_components_edges(G: nx.Graph) -> List[List[Tuple[int], Set[int]]]:
+def _compute_biconnected_components_edges(G: nx.Graph) -> List[List[Union[Set[int], List[Tuple[int]]]]]:
 	"""
 	Biconnected components are maximal subgraphs such that the removal of a node (and all edges incident on that node) will not disconnect the subgraph.
     Source: 
@@ -54,8 +58,20 @@ def _compute_bridges(G: nx.Graph) -> List[Tuple[int]]:
     """
     return list(nx.bridges(G))
 
-def _compute_shortest_path(G: nx.Graph) -> Dict[Dict[int,List[int]]]:
+def _compute_shortest_path(G: nx.Graph, source: int, target: int = None, weighted: bool = False) -> Union[List[int], Iterator[Tuple[int, List[int]]]]:
+    """
+    Shortest path from source to target, or a generator streaming (target, path) for every book reachable from source.
+    Paths are queried on demand from paths.get_path_service(G) rather than materialising every pair with nx.shortest_path(G).
+    ------------------
+    weighted: Use co-purchase weights as edge lengths instead of counting hops
+    """
+    service = paths.get_path_service(G)
+    if target is None:
+        return service.iter_paths(source, weighted)
+    return service.shortest_path(source, target, weighted)
+
+def _estimate_distance(G: nx.Graph, source: int, target: int) -> Tuple[float, float]:
     """
-    Source: https://networkx.github.io/documentation/stable/_modules/networkx/algorithms/shortest_paths/generic.html#shortest_path
+    Lower and upper bounds on the number of hops between two books, from distances to landmark books.
     """
-    return nx.shortest_path(G)
\ No newline at end of file
+    return paths.get_path_service(G).estimate_distance(source, target)
\ No newline at end of file
@@ -8,27 +8,29 @@ import charts
 import helpers
 
 # Generate Plotly content
-content = html.Section(
-    children = [
-        html.Div([
-            html.H2("Network Analysis at a glance...", className="align-center"),
-            html.Div([
-                dcc.Dropdown(
-                    id="corr_dir",
-                    options=[{"label": "Positive", "value": "Positive"}, {"label": "Negative", "value": "Negative"}],
-                    value=""
-                )
-            ]),
-            html.Div(id="corr_network"),
+def content():
+    return html.Section(
+        children = [
             html.Div([
-                dcc.Input(id="ego_network_count", type="text", value="0", placeholder="Top-N Ego-networks"),
-            ], style = {
-                "textAlign": "center" 
-            }),
-            html.Div(id="ego_network")
-        ])
-    ]
-)
+                html.H2("Network Analysis at a glance...", className="align-center"),
+                html.Div([
+                    dcc.Dropdown(
+                        id="corr_dir",
+                        options=[{"label": "Positive", "value": "Positive"}, {"label": "Negative", "value": "Negative"}],
+                        value=""
+                    )
+                ]),
+                html.Div(id="corr_network"),
+                html.Div([
+                    dcc.Input(id="ego_network_count", type="text", value="0", placeholder="Top-N Ego-networks"),
+                ], style = {
+                    "textAlign": "center" 
+                }),
+                html.Div(id="ego_network")
+            ])
+        ]
+    )
+
 @app.callback(
     Output("ego_network", "children"),
     [
@@ -0,0 +1,253 @@
+"""
+On-demand shortest path queries.
+------------------
+PathService answers single-pair queries with a bidirectional search over a csr.CSRGraph: BFS for hop
+counts, Dijkstra with edge weights as lengths. Single-source queries stream their paths from a shortest
+path tree, and recent trees are kept in an LRU cache. Distances to a few high-degree landmarks give
+quick lower and upper bounds on how far apart two books are without searching at all.
+"""
+import heapq
+import weakref
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import networkx as nx
+
+import cache
+import config
+import csr
+
+# Marks a position the search hasn't reached in the predecessor arrays
+_UNREACHED = -2
+# Predecessor of the source (or target) of a search
+_ROOT = -1
+
+def _sizeof_tree(tree: Tuple[np.ndarray, np.ndarray]) -> int:
+	distance, predecessor = tree
+	return distance.nbytes + predecessor.nbytes
+
+class PathService:
+	"""
+	Shortest path queries over a CSR graph.
+	------------------
+	cache_max_bytes: Budget of the LRU cache of single-source trees, defaults to config.PATH_CACHE_MAX_BYTES
+	n_landmarks: Landmarks used by estimate_distance, defaults to config.PATH_LANDMARKS
+
+	weighted queries treat edge weights as lengths, like nx.shortest_path(G, weight = 'weight'), others count hops.
+	Unknown nodes raise nx.NodeNotFound and disconnected pairs nx.NetworkXNoPath, as networkx does.
+	"""
+	def __init__(self, graph: csr.CSRGraph, cache_max_bytes: int = None, n_landmarks: int = None):
+		self.graph = graph
+		self.trees = cache.LRUCache(config.PATH_CACHE_MAX_BYTES if cache_max_bytes is None else cache_max_bytes, sizeof = _sizeof_tree)
+		self.n_landmarks = config.PATH_LANDMARKS if n_landmarks is None else n_landmarks
+		self._landmarks = None
+
+	def _position(self, node) -> int:
+		try:
+			return int(self.graph.positions([node])[0])
+		except KeyError:
+			raise nx.NodeNotFound(f"Node {node} is not in the graph")
+
+	def _path(self, predecessor: np.ndarray, position: int) -> List[int]:
+		"""
+		Positions from the root of the predecessor array (or dict) to position, root first.
+		"""
+		path = []
+		while position != _ROOT:
+			path.append(position)
+			position = int(predecessor[position])
+		path.reverse()
+		return path
+
+	def _bidirectional_bfs(self, source: int, target: int) -> List[int]:
+		"""
+		Expands the smaller frontier a level at a time until the two searches meet.
+		Searches only touch the nodes they reach, so they keep dicts rather than arrays over the whole graph.
+		"""
+		if source == target:
+			return [source]
+		indptr, indices = self.graph.indptr, self.graph.indices
+		predecessors = [{source: _ROOT}, {target: _ROOT}]
+		frontiers = [[source], [target]]
+		while frontiers[0] and frontiers[1]:
+			side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+			predecessor, other = predecessors[side], predecessors[1 - side]
+			frontier, frontiers[side] = frontiers[side], []
+			for position in frontier:
+				for neighbour in indices[indptr[position]:indptr[position + 1]].tolist():
+					if neighbour not in predecessor:
+						predecessor[neighbour] = position
+						frontiers[side].append(neighbour)
+					# The two searches were disjoint up to their current depths, so the first meeting is a shortest path
+					if neighbour in other:
+						forward = self._path(predecessors[0], neighbour)
+						backward = self._path(predecessors[1], neighbour)
+						return forward + backward[-2::-1]
+		raise nx.NetworkXNoPath(f"No path between {self.graph.nodes[source]} and {self.graph.nodes[target]}")
+
+	def _neighbours(self, position: int) -> Tuple[List[int], List[float]]:
+		start, end = self.graph.indptr[position], self.graph.indptr[position + 1]
+		return self.graph.indices[start:end].tolist(), self.graph.weights[start:end].tolist()
+
+	def _bidirectional_dijkstra(self, source: int, target: int) -> List[int]:
+		"""
+		Alternates Dijkstra steps from both ends and stops once the two queues' minima can't improve the best meeting.
+		"""
+		if source == target:
+			return [source]
+		distances = [{source: 0.0}, {target: 0.0}]
+		predecessors = [{source: _ROOT}, {target: _ROOT}]
+		settled = [set(), set()]
+		queues = [[(0.0, source)], [(0.0, target)]]
+		best, middle = float('inf'), None
+
+		while queues[0] and queues[1]:
+			if queues[0][0][0] + queues[1][0][0] >= best:
+				break
+			side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+			length, position = heapq.heappop(queues[side])
+			if position in settled[side]:
+				continue
+			settled[side].add(position)
+
+			distance, predecessor, other = distances[side], predecessors[side], distances[1 - side]
+			for neighbour, weight in zip(*self._neighbours(position)):
+				candidate = length + weight
+				if candidate < distance.get(neighbour, float('inf')):
+					distance[neighbour] = candidate
+					predecessor[neighbour] = position
+					heapq.heappush(queues[side], (candidate, neighbour))
+				if neighbour in other and candidate + other[neighbour] < best:
+					best, middle = candidate + other[neighbour], neighbour
+
+		if middle is None:
+			raise nx.NetworkXNoPath(f"No path between {self.graph.nodes[source]} and {self.graph.nodes[target]}")
+		forward = self._path(predecessors[0], middle)
+		backward = self._path(predecessors[1], middle)
+		return forward + backward[-2::-1]
+
+	def shortest_path(self, source, target, weighted: bool = False) -> List[int]:
+		"""
+		Node ids of a shortest path from source to target, both included.
+		"""
+		source_position, target_position = self._position(source), self._position(target)
+		# Only a cached tree counts as a lookup, searching without one isn't a cache miss
+		tree = self.trees.get((source, weighted)) if (source, weighted) in self.trees else None
+		if tree is not None:
+			if tree[1][target_position] == _UNREACHED:
+				raise nx.NetworkXNoPath(f"No path between {source} and {target}")
+			positions = self._path(tree[1], target_position)
+		elif weighted:
+			positions = self._bidirectional_dijkstra(source_position, target_position)
+		else:
+			positions = self._bidirectional_bfs(source_position, target_position)
+		return self.graph.nodes[positions].tolist()
+
+	def shortest_path_length(self, source, target, weighted: bool = False) -> float:
+		path = self.graph.positions(self.shortest_path(source, target, weighted))
+		if not weighted:
+			return len(path) - 1
+		return float(sum(self._edge_weight(u, v) for u, v in zip(path[:-1].tolist(), path[1:].tolist())))
+
+	def _edge_weight(self, u: int, v: int) -> float:
+		start, end = self.graph.indptr[u], self.graph.indptr[u + 1]
+		return float(self.graph.weights[start + np.searchsorted(self.graph.indices[start:end], v)])
+
+	def _build_tree(self, source: int, weighted: bool) -> Tuple[np.ndarray, np.ndarray]:
+		graph = self.graph
+		predecessor = np.full(len(graph), _UNREACHED, dtype = np.int64)
+		predecessor[source] = _ROOT
+		if not weighted:
+			distance = np.full(len(graph), -1, dtype = np.int64)
+			distance[source] = 0
+			frontier = np.array([source])
+			while len(frontier):
+				slots, counts = graph._slots(frontier)
+				neighbours = graph.indices[slots]
+				new = distance[neighbours] < 0
+				reached, first = np.unique(neighbours[new], return_index = True)
+				predecessor[reached] = np.repeat(frontier, counts)[new][first]
+				distance[reached] = distance[frontier[0]] + 1
+				frontier = reached
+			return distance, predecessor
+
+		distance = np.full(len(graph), np.inf)
+		distance[source] = 0.0
+		queue = [(0.0, source)]
+		settled = np.zeros(len(graph), dtype = bool)
+		while queue:
+			length, position = heapq.heappop(queue)
+			if settled[position]:
+				continue
+			settled[position] = True
+			for neighbour, weight in zip(*self._neighbours(position)):
+				if length + weight < distance[neighbour]:
+					distance[neighbour] = length + weight
+					predecessor[neighbour] = position
+					heapq.heappush(queue, (length + weight, neighbour))
+		return distance, predecessor
+
+	def source_tree(self, source, weighted: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+		"""
+		(distance, predecessor) arrays by position of the shortest path tree from source, cached per (source, weighted).
+		Unreached positions have distance -1 (inf when weighted) and predecessor -2, the source has predecessor -1.
+		"""
+		position = self._position(source)
+		def build():
+			tree = self._build_tree(position, weighted)
+			for array in tree:
+				array.setflags(write = False)
+			return tree
+		return self.trees.get_or_create((source, weighted), build)
+
+	def iter_paths(self, source, weighted: bool = False) -> Iterator[Tuple[int, List[int]]]:
+		"""
+		Streams (target, path) for every node reachable from source, nearest first.
+		Only the tree is held in memory, each path is walked from it as it is yielded.
+		"""
+		distance, predecessor = self.source_tree(source, weighted)
+		reached = np.flatnonzero(predecessor != _UNREACHED)
+		for position in reached[np.argsort(distance[reached], kind = 'stable')].tolist():
+			yield int(self.graph.nodes[position]), self.graph.nodes[self._path(predecessor, position)].tolist()
+
+	def _landmark_distances(self) -> np.ndarray:
+		"""
+		Hop distances from the highest-degree nodes, one row per landmark, computed on first use.
+		"""
+		if self._landmarks is None:
+			landmarks = np.argsort(-self.graph.degree(), kind = 'stable')[:self.n_landmarks]
+			rows = [self.graph.bfs(node) for node in self.graph.nodes[landmarks].tolist()]
+			self._landmarks = np.array(rows, dtype = np.int32).reshape(len(landmarks), len(self.graph))
+		return self._landmarks
+
+	def estimate_distance(self, source, target) -> Tuple[float, float]:
+		"""
+		Lower and upper bounds on the hop distance between two nodes from the landmark distances, without a search.
+		------------------
+		By the triangle inequality |d(source, l) - d(l, target)| <= d(source, target) <= d(source, l) + d(l, target).
+		Both bounds are inf when a landmark shows the nodes lie in different components, the upper one when no landmark reaches them.
+		"""
+		source_position, target_position = self._position(source), self._position(target)
+		if source_position == target_position:
+			return 0.0, 0.0
+		landmarks = self._landmark_distances()
+		to_source, to_target = landmarks[:, source_position], landmarks[:, target_position]
+		if np.any((to_source >= 0) != (to_target >= 0)):
+			return float('inf'), float('inf')
+		both = (to_source >= 0) & (to_target >= 0)
+		if not both.any():
+			return 1.0, float('inf')
+		lower = max(1, int(np.abs(to_source[both] - to_target[both]).max()))
+		upper = int((to_source[both] + to_target[both]).min())
+		return float(lower), float(upper)
+
+	def cache_stats(self) -> Dict[str, int]:
+		return self.trees.stats()
+
+_SERVICES = weakref.WeakKeyDictionary()
+
+def get_path_service(G: nx.Graph) -> PathService:
+	"""
+	PathService over a networkx graph, converted to CSR once per frozen graph.
+	"""
+	return cache.per_frozen_graph(_SERVICES, G, lambda: PathService(csr.CSRGraph.from_networkx(G)))
@@ -0,0 +1,315 @@
+"""
+Indexed filtering for the stats table.
+------------------
+A DataTable filter_query is compiled once into a tree of clauses joined by && and ||.
+Numeric columns keep a sorted index so range clauses are answered by binary search, and categorical
+columns keep the rows of each value. Each clause gives a set of row positions, && intersects them and
+|| takes their union, and clauses the indexes can't answer (e.g. contains) are applied as masks to the
+remaining rows only. Recent filter strings and their matching rows are kept in small LRU caches.
+"""
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import cache
+import config
+
+NUMERIC_COLUMNS = ['sales_rank', 'price', 'num_pages', 'num_reviews', 'avg_rating']
+CATEGORICAL_COLUMNS = ['genre']
+
+def _mask(column: pd.Series, operator: str, value) -> np.ndarray:
+	"""
+	Boolean mask of one clause over a column, for clauses the indexes don't answer.
+	"""
+	if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+		# these operators match pandas series operator method names
+		return getattr(column, operator)(value).to_numpy()
+	elif operator == 'contains':
+		return column.str.contains(value).to_numpy()
+	elif operator == 'datestartswith':
+		return column.str.startswith(value).to_numpy()
+	raise ValueError(f"Unknown filter operator {operator}")
+
+class Clause:
+	"""
+	`{column} operator value`, the leaf of a compiled filter.
+	"""
+	def __init__(self, column: str, operator: str, value):
+		self.column = column
+		self.operator = operator
+		self.value = value
+
+	def mask(self, df: pd.DataFrame) -> np.ndarray:
+		return _mask(df[self.column], self.operator, self.value)
+
+	def positions(self, index: 'TableIndex', candidates: np.ndarray = None) -> np.ndarray:
+		rows = index._clause_rows(self.column, self.operator, self.value)
+		if rows is None:
+			candidates = index._all_rows() if candidates is None else candidates
+			return candidates[_mask(index.df[self.column].iloc[candidates], self.operator, self.value)]
+		return index._restrict(rows, candidates)
+
+	def __repr__(self):
+		return f"Clause({self.column!r}, {self.operator!r}, {self.value!r})"
+
+class And:
+	"""
+	Rows matching every child. No children matches every row.
+	"""
+	def __init__(self, children: List):
+		self.children = children
+
+	def mask(self, df: pd.DataFrame) -> np.ndarray:
+		mask = np.ones(len(df), dtype = bool)
+		for child in self.children:
+			mask &= child.mask(df)
+		return mask
+
+	def positions(self, index: 'TableIndex', candidates: np.ndarray = None) -> np.ndarray:
+		# Indexed clauses first, from the most selective, so masks and nested ORs only see the surviving rows
+		indexed = []
+		others = []
+		for child in self.children:
+			rows = index._clause_rows(child.column, child.operator, child.value) if isinstance(child, Clause) else None
+			if rows is None:
+				others.append(child)
+			else:
+				indexed.append(rows)
+
+		for rows in sorted(indexed, key = len):
+			candidates = index._restrict(rows, candidates)
+		for child in others:
+			candidates = child.positions(index, candidates)
+		return index._all_rows() if candidates is None else candidates
+
+	def __repr__(self):
+		return f"And({self.children!r})"
+
+class Or:
+	"""
+	Rows matching any child.
+	"""
+	def __init__(self, children: List):
+		self.children = children
+
+	def mask(self, df: pd.DataFrame) -> np.ndarray:
+		mask = np.zeros(len(df), dtype = bool)
+		for child in self.children:
+			mask |= child.mask(df)
+		return mask
+
+	def positions(self, index: 'TableIndex', candidates: np.ndarray = None) -> np.ndarray:
+		positions = [child.positions(index, candidates) for child in self.children]
+		return np.unique(np.concatenate(positions)) if positions else np.empty(0, dtype = np.int64)
+
+	def __repr__(self):
+		return f"Or({self.children!r})"
+
+_TOKEN = re.compile(r"""\s*(?:
+	(?P<column>\{(?:[^}\\]|\\.)*\})
+	|(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`(?:[^`\\]|\\.)*`)
+	|(?P<logical>&&|\|\|)
+	|(?P<paren>[()])
+	|(?P<relation><=|>=|!=|=|<|>)
+	|(?P<word>[^\s(){}'"`&|<>=!]+)
+)""", re.VERBOSE)
+
+_OPERATORS = {
+	'eq': 'eq', '=': 'eq',
+	'ne': 'ne', '!=': 'ne',
+	'lt': 'lt', '<': 'lt',
+	'le': 'le', '<=': 'le',
+	'gt': 'gt', '>': 'gt',
+	'ge': 'ge', '>=': 'ge',
+	'contains': 'contains',
+	'datestartswith': 'datestartswith'
+}
+
+_LOGICAL = {'&&': '&&', 'and': '&&', '||': '||', 'or': '||'}
+
+def _tokenize(filter: str) -> List[Tuple[str, str]]:
+	tokens = []
+	position = 0
+	filter = filter.rstrip()
+	while position < len(filter):
+		match = _TOKEN.match(filter, position)
+		if match is None or match.end() == position:
+			raise ValueError(f"Unexpected character at {position} in filter {filter!r}")
+		kind = match.lastgroup
+		text = match.group(kind)
+		if kind == 'word' and text.lower() in _LOGICAL:
+			kind = 'logical'
+		tokens.append((kind, text))
+		position = match.end()
+	return tokens
+
+def _unquote(text: str) -> str:
+	quote = text[0]
+	return text[1:-1].replace('\\' + quote, quote)
+
+def _value(kind: str, text: str):
+	if kind == 'string':
+		return _unquote(text)
+	try:
+		return float(text)
+	except ValueError:
+		return text
+
+class _Parser:
+	"""
+	Recursive descent over the tokens, with && binding tighter than ||:
+	or := and ('||' and)*, and := term ('&&' term)*, term := '(' or ')' | {column} operator value
+	"""
+	def __init__(self, filter: str):
+		self.filter = filter
+		self.tokens = _tokenize(filter)
+		self.position = 0
+
+	def _peek(self) -> Tuple[str, str]:
+		return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+	def _next(self) -> Tuple[str, str]:
+		token = self._peek()
+		if token[0] is None:
+			raise ValueError(f"Unexpected end of filter {self.filter!r}")
+		self.position += 1
+		return token
+
+	def parse(self):
+		if not self.tokens:
+			return And([])
+		node = self._or()
+		if self.position != len(self.tokens):
+			raise ValueError(f"Unexpected {self._peek()[1]!r} in filter {self.filter!r}")
+		return node
+
+	def _logical(self, parse_operand, symbol: str, node_type):
+		children = [parse_operand()]
+		while self._peek()[0] == 'logical' and _LOGICAL[self._peek()[1].lower()] == symbol:
+			self._next()
+			children.append(parse_operand())
+		return children[0] if len(children) == 1 else node_type(children)
+
+	def _or(self):
+		return self._logical(self._and, '||', Or)
+
+	def _and(self):
+		return self._logical(self._term, '&&', And)
+
+	def _term(self):
+		kind, text = self._next()
+		if (kind, text) == ('paren', '('):
+			node = self._or()
+			if self._next() != ('paren', ')'):
+				raise ValueError(f"Unbalanced parentheses in filter {self.filter!r}")
+			return node
+		if kind != 'column':
+			raise ValueError(f"Expected a {{column}} but got {text!r} in filter {self.filter!r}")
+
+		column = text[1:-1].replace('\\}', '}')
+		kind, text = self._next()
+		operator = _OPERATORS.get(text.lower()) if kind in ('word', 'relation') else None
+		if operator is None:
+			raise ValueError(f"Unknown operator {text!r} in filter {self.filter!r}")
+		kind, text = self._next()
+		if kind not in ('word', 'string'):
+			raise ValueError(f"Expected a value but got {text!r} in filter {self.filter!r}")
+		return Clause(column, operator, _value(kind, text))
+
+_COMPILED = cache.LRUCache(config.QUERY_CACHE_SIZE)
+
+def compile_filter(filter: str):
+	"""
+	Compiles a DataTable filter_query into a predicate, memoised by query string.
+	------------------
+	The predicate is a tree of Clause, And and Or supporting &&, || and parentheses.
+	predicate.mask(df) gives the matching rows of any frame, TableIndex answers it from its indexes.
+	Raises ValueError when the query doesn't parse.
+	"""
+	return _COMPILED.get_or_create(filter or '', lambda: _Parser(filter or '').parse())
+
+class TableIndex:
+	"""
+	Sorted and categorical indexes over a DataFrame, answering DataTable filter queries.
+	------------------
+	numeric_columns: Columns with a sorted index for range and equality clauses
+	categorical_columns: Columns with the rows of each value, for equality clauses
+	cache_size: Number of recent filter strings whose matching rows are kept
+	"""
+	def __init__(self, df: pd.DataFrame, numeric_columns: List[str] = NUMERIC_COLUMNS, categorical_columns: List[str] = CATEGORICAL_COLUMNS, cache_size: int = None):
+		self.df = df
+		self._sorted = {}
+		for column in numeric_columns:
+			if column in df:
+				values = df[column].to_numpy(dtype = float)
+				order = np.argsort(values, kind = 'stable')
+				# NaNs sort last and match no range clause
+				self._sorted[column] = (values[order], order, int(np.count_nonzero(~np.isnan(values))))
+
+		self._categories = {column: df.groupby(column, sort = False).indices for column in categorical_columns if column in df}
+		self._results = cache.LRUCache(config.QUERY_CACHE_SIZE if cache_size is None else cache_size)
+
+	def _clause_rows(self, column: str, operator: str, value) -> np.ndarray:
+		"""
+		Row positions matching one clause, or None when the indexes can't answer it.
+		"""
+		# _value parses numbers as floats, strings and NaN are left to the masks
+		if not isinstance(value, float) or np.isnan(value):
+			return None
+
+		if column in self._categories and operator in ('eq', 'ne'):
+			rows = self._categories[column].get(value, np.empty(0, dtype = np.int64))
+			if operator == 'ne':
+				rows = np.setdiff1d(np.arange(len(self.df)), rows, assume_unique = True)
+			return rows
+
+		if column in self._sorted and operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+			values, order, n_valid = self._sorted[column]
+			left = np.searchsorted(values[:n_valid], value, side = 'left')
+			right = np.searchsorted(values[:n_valid], value, side = 'right')
+			return {
+				'eq': lambda: order[left:right],
+				# NaN != value holds, so NaN rows stay in
+				'ne': lambda: np.concatenate((order[:left], order[right:])),
+				'lt': lambda: order[:left],
+				'le': lambda: order[:right],
+				'gt': lambda: order[right:n_valid],
+				'ge': lambda: order[left:n_valid]
+			}[operator]()
+
+		return None
+
+	def _all_rows(self) -> np.ndarray:
+		return np.arange(len(self.df))
+
+	def _restrict(self, rows: np.ndarray, candidates: np.ndarray = None) -> np.ndarray:
+		"""
+		Sorted positions of rows that are also candidates, every row being a candidate when None.
+		"""
+		if candidates is None:
+			return np.sort(rows)
+		member = np.zeros(len(self.df), dtype = bool)
+		member[rows] = True
+		return candidates[member[candidates]]
+
+	def positions(self, filter: str) -> np.ndarray:
+		"""
+		Sorted positions of the rows matching a DataTable filter_query.
+		"""
+		def evaluate():
+			positions = np.array(compile_filter(filter).positions(self), dtype = np.int64)
+			positions.setflags(write = False)
+			return positions
+		return self._results.get_or_create(filter or '', evaluate)
+
+	def filter(self, filter: str) -> pd.DataFrame:
+		"""
+		The matching rows, taken column by column: df.iloc would first consolidate a frame of memory-mapped columns into a copy.
+		"""
+		positions = self.positions(filter)
+		return pd.DataFrame({column: self.df[column].to_numpy()[positions] for column in self.df.columns}, index = self.df.index[positions])
+
+	def cache_stats(self) -> Dict[str, int]:
+		return self._results.stats()
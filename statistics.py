@@ -1,30 +1,46 @@
+import dash
 import dash_core_components as dcc
 import dash_html_components as html
 from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
 
 import charts
 import helpers
 
 from app import app
 
-content = html.Section(
-    children = [
-        html.Div([
-            html.H2("At a Glance", className="align-center"),
-            dcc.Graph(
-                id = 'sales_indicator',
-                figure = charts.get_generic_insights(),
-                config = {"displayModeBar" : False}
-            ),
-            charts.get_stats_table()
-        ])
-    ]
-)
+def content():
+    return html.Section(
+        children = [
+            html.Div([
+                html.H2("At a Glance", className="align-center"),
+                dcc.Graph(
+                    id = 'sales_indicator',
+                    figure = charts.get_generic_insights(),
+                    config = {"displayModeBar" : False}
+                ),
+                charts.get_stats_table()
+            ])
+        ]
+    )
 
 @app.callback(
-    Output('stats_table', 'data'),
-    [Input('stats_table', 'filter_query')]
+    [Output('stats_table', 'data'),
+    Output('stats_table', 'page_count'),
+    Output('stats_table', 'page_current')],
+    [Input('stats_table', 'filter_query'),
+    Input('stats_table', 'sort_by'),
+    Input('stats_table', 'page_current'),
+    Input('stats_table', 'page_size')]
 )
-def update_table(filter):
-    filtered_df = charts.filter_stats_table(filter)
-    return filtered_df.to_dict('records')
\ No newline at end of file
+def update_table(filter, sort_by = None, page_current = 0, page_size = charts.STATS_PAGE_SIZE):
+    # A new filter or order starts from the first page
+    triggers = {trigger['prop_id'] for trigger in dash.callback_context.triggered}
+    if triggers & {'stats_table.filter_query', 'stats_table.sort_by'}:
+        page_current = 0
+    try:
+        page, total = charts.query_stats_table(filter, sort_by, page_current or 0, page_size)
+    except ValueError:
+        # A filter that doesn't parse (yet) leaves the table as it is
+        raise PreventUpdate
+    return page, charts.stats_page_count(total, page_size), page_current or 0
\ No newline at end of file
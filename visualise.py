@@ -1,6 +1,7 @@
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 
 import dash_cytoscape as cyto
 cyto.load_extra_layouts()
@@ -9,206 +10,287 @@ import charts
 import helpers
 from app import app
 
-content = [
-    html.H1("Visualise"),
-    html.Div(className = 'mg-t-20', children = [
-        html.Div(className = 'row', children = [
-            html.Div(className = 'col-lg-3', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("Chart Layout"),
-                    dcc.Dropdown(
-                        id="chart_type_option",
-                        options=helpers.generate_options(helpers.network_layout_options()),
-                        value="cose",
-                        clearable = False
-                    )
-                ])
-            ]),
-            html.Div(className = 'col-lg-6', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("Nodes to use (Separate nodes with a comma without spacing)"),
-                    dcc.Input(
-                        id = "nodes_filter",
-                        type="text",
-                        value="",
-                        debounce=False,
-                        style = { 'width': '100%', 'height': '40px' },
-                    )
-                ])
-            ]),
-            html.Div(className = 'col-lg-3', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("Node Colour"),
-                    dcc.Dropdown(
-                        id = "node_colour_option",
-                        options = helpers.generate_options(helpers.data_attributes()),
-                        value = 'genre',
-                        clearable = False
-                    )
-                ])
-            ])
-        ])
-    ]),
-    html.Div(className = 'mg-t-20', children = [
-        html.Div(className = 'row', children = [
-            html.Div(className = 'col-lg-3', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("Genre"),
-                    dcc.Dropdown(
-                        id="genre_filter",
-                        options= helpers.generate_options(charts.get_unique_genres()),
-                        multi = True,
-                        clearable = False
-                    )
-                ])
-            ]),
-            html.Div(className = 'col-lg-3', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("Sales Rank"),
-                    dcc.Dropdown(
-                        id="sales_rank_filter",
-                        options=helpers.generate_options(charts.get_sales_rank_categories()),
-                        multi = True,
-                        clearable = False,
-                    )
-                ])
-            ]),
-            html.Div(className = 'col-lg-3', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("Average Rating"),
-                    dcc.Dropdown(
-                        id="rating_filter",
-                        options=helpers.generate_options(charts.get_unique_ratings()),
-                        multi = True,
-                        clearable = False
-                    )
-                ])
-            ]),
-            html.Div(className = 'col-lg-3', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("No. of Reviews"),
-                    dcc.Dropdown(
-                        id="reviews_filter",
-                        options=helpers.generate_options(charts.get_review_categories()),
-                        multi = True,
-                        clearable = False
-                    )
-                ])
-            ])
-        ])
-    ]),
-    html.Div(className = 'mg-t-20', children = [
-        html.Div(className = 'row', children = [
-            html.Div(className = 'col-lg-6', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("No. of Pages"),
-                    dcc.RangeSlider(
-                        id = 'page_filter',
-                        marks=helpers.generate_range_values(charts.get_num_pages_quantiles()),
-                        min=0,
-                        max=10,
-                        value=[0, 10]
-                    )
-                ])
-            ]),
-            html.Div(className = 'col-lg-6', children = [
-                html.Div(className = 'bar-chart-wp', children = [
-                    html.B("Price"),
-                    dcc.RangeSlider(
-                        id = 'price_filter',
-                        marks=helpers.generate_range_values(charts.get_price_quantiles()),
-                        min=0,
-                        max=10,
-                        value=[0, 10]
-                    )
+def content():
+    """
+    Built per request so the initial graph elements and filter options are computed on first use, not at import.
+    """
+    return [
+        html.H1("Visualise"),
+        html.Div(className = 'mg-t-20', children = [
+            html.Div(className = 'row', children = [
+                html.Div(className = 'col-lg-3', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("Chart Layout"),
+                        dcc.Dropdown(
+                            id="chart_type_option",
+                            options=helpers.generate_options(helpers.network_layout_options()),
+                            value="cose",
+                            clearable = False
+                        ),
+                        dcc.RadioItems(
+                            id = 'layout_engine',
+                            options = [{'label': 'In browser', 'value': 'browser'}, {'label': 'Precomputed on server', 'value': 'server'}],
+                            value = 'browser',
+                            labelStyle = {'display': 'inline-block', 'margin-right': '10px'}
+                        )
+                    ])
+                ]),
+                html.Div(className = 'col-lg-6', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("Nodes to use (Separate nodes with a comma without spacing)"),
+                        dcc.Input(
+                            id = "nodes_filter",
+                            type="text",
+                            value="",
+                            debounce=False,
+                            style = { 'width': '100%', 'height': '40px' },
+                        )
+                    ])
+                ]),
+                html.Div(className = 'col-lg-3', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("Node Colour"),
+                        dcc.Dropdown(
+                            id = "node_colour_option",
+                            options = helpers.generate_options(helpers.data_attributes()),
+                            value = 'genre',
+                            clearable = False
+                        )
+                    ])
                 ])
             ])
-        ])
-    ]),
-    html.Div(className = 'mg-t-20', children = [
-        html.Div(className = 'row', children = [
-            html.Div(className = 'col-lg-6', children = [
-                html.H3("Overall"),
-                html.Div(className = 'bar-chart-wp', children = [
-                    cyto.Cytoscape(
-                        id='cyto-network',
-                        layout={'name': 'cose'},
-                        style={'width': '100%', 'height': '55vh'},
-                        elements = charts.plot_cyto_graph()
-                    ),
-                    html.P(id='cyto-network-mouseoverNodeData-output')
+        ]),
+        html.Div(className = 'mg-t-20', children = [
+            html.Div(className = 'row', children = [
+                html.Div(className = 'col-lg-3', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("Genre"),
+                        dcc.Dropdown(
+                            id="genre_filter",
+                            options= helpers.generate_options(charts.get_unique_genres()),
+                            multi = True,
+                            clearable = False
+                        )
+                    ])
                 ]),
-            ]),
-            html.Div(className = 'col-lg-6', children = [
-                html.Div(className = "row", children = [
-                    html.Div(className = 'col-lg-8', children = [
-                        html.H3("Cliques")
-                    ]),
-                    html.Div(className = 'col-lg-4', children = [
-                        dcc.Slider(
-                            id = 'nclique_filter',
-                            min = 0,
-                            max = 3,
-                            marks = helpers.generate_range_values(helpers.clique_sizes()),
-                            value = 1
+                html.Div(className = 'col-lg-3', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("Sales Rank"),
+                        dcc.Dropdown(
+                            id="sales_rank_filter",
+                            options=helpers.generate_options(charts.get_sales_rank_categories()),
+                            multi = True,
+                            clearable = False,
                         )
                     ])
                 ]),
-                html.Div(className = 'bar-chart-wp', children = [
-                    cyto.Cytoscape(
-                        id='cyto-clique-network',
-                        layout={'name': 'cose'},
-                        style={'width': '100%', 'height': '30vh'},
-                        elements = charts.plot_cyto_nclique_graph()
-                    ),
-                    html.P(id='cyto-clique-network-mouseoverNodeData-output')
+                html.Div(className = 'col-lg-3', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("Average Rating"),
+                        dcc.Dropdown(
+                            id="rating_filter",
+                            options=helpers.generate_options(charts.get_unique_ratings()),
+                            multi = True,
+                            clearable = False
+                        )
+                    ])
+                ]),
+                html.Div(className = 'col-lg-3', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("No. of Reviews"),
+                        dcc.Dropdown(
+                            id="reviews_filter",
+                            options=helpers.generate_options(charts.get_review_categories()),
+                            multi = True,
+                            clearable = False
+                        )
+                    ])
+                ])
+            ])
+        ]),
+        html.Div(className = 'mg-t-20', children = [
+            html.Div(className = 'row', children = [
+                html.Div(className = 'col-lg-6', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("No. of Pages"),
+                        dcc.RangeSlider(
+                            id = 'page_filter',
+                            marks=helpers.generate_range_values(charts.get_num_pages_quantiles()),
+                            min=0,
+                            max=10,
+                            value=[0, 10]
+                        )
+                    ])
                 ]),
-                html.Div(className = 'mg-t-20', children = [
-                    html.H3("Egos"),
+                html.Div(className = 'col-lg-6', children = [
+                    html.Div(className = 'bar-chart-wp', children = [
+                        html.B("Price"),
+                        dcc.RangeSlider(
+                            id = 'price_filter',
+                            marks=helpers.generate_range_values(charts.get_price_quantiles()),
+                            min=0,
+                            max=10,
+                            value=[0, 10]
+                        )
+                    ])
+                ])
+            ])
+        ]),
+        html.Div(className = 'mg-t-20', children = [
+            html.Div(className = 'row', children = [
+                html.Div(className = 'col-lg-6', children = [
                     html.Div(className = "row", children = [
-                        html.Div(className = 'col-lg-4', children = [
-                            html.Div(className = 'bar-chart-wp', children = [
-                                cyto.Cytoscape(
-                                    id='cyto-ego-network-1',
-                                    layout={'name': 'cose'},
-                                    style={'width': '100%', 'height': '20vh'},
-                                    elements = []
-                                ),
-                                html.P(id='cyto-ego-network-1-mouseoverNodeData-output')
-                            ])
+                        html.Div(className = 'col-lg-6', children = [
+                            html.H3("Overall")
                         ]),
-                        html.Div(className = 'col-lg-4', children = [
-                            html.Div(className = 'bar-chart-wp', children = [
-                                cyto.Cytoscape(
-                                    id='cyto-ego-network-2',
-                                    layout={'name': 'cose'},
-                                    style={'width': '100%', 'height': '20vh'},
-                                    elements = []
-                                ),
-                                html.P(id='cyto-ego-network-2-mouseoverNodeData-output')
-                            ])
+                        html.Div(className = 'col-lg-6', children = [
+                            html.B("Centrality"),
+                            dcc.RadioItems(
+                                id = 'centrality_scope',
+                                options = [{'label': 'Whole network', 'value': 'global'}, {'label': 'Filtered subgraph', 'value': 'subgraph'}],
+                                value = 'global',
+                                labelStyle = {'display': 'inline-block', 'margin-right': '10px'}
+                            )
+                        ])
+                    ]),
+                    html.Div(className = "row", children = [
+                        html.Div(className = 'col-lg-6', children = [
+                            html.B("Show"),
+                            dcc.Dropdown(
+                                id = 'detail_limit',
+                                options = [{'label': f"Top {limit} nodes" if limit else "All nodes", 'value': limit} for limit in helpers.detail_limits()],
+                                value = 0,
+                                clearable = False
+                            )
+                        ]),
+                        html.Div(className = 'col-lg-6', children = [
+                            html.B("Ranked by"),
+                            dcc.Dropdown(
+                                id = 'detail_metric',
+                                options = [
+                                    {'label': 'Degree Centrality', 'value': 'degree_centrality'},
+                                    {'label': 'Betweenness Centrality', 'value': 'betweenness_centrality'},
+                                    {'label': 'Closeness Centrality', 'value': 'closeness_centrality'}
+                                ],
+                                value = 'degree_centrality',
+                                clearable = False
+                            )
+                        ])
+                    ]),
+                    # Nodes clicked open while a node limit is set
+                    dcc.Store(id = 'expanded_nodes', data = []),
+                    html.Div(className = 'bar-chart-wp', children = [
+                        cyto.Cytoscape(
+                            id='cyto-network',
+                            layout={'name': 'cose'},
+                            style={'width': '100%', 'height': '55vh'},
+                            elements = []
+                        ),
+                        html.P(id='cyto-network-mouseoverNodeData-output')
+                    ]),
+                ]),
+                html.Div(className = 'col-lg-6', children = [
+                    html.Div(className = "row", children = [
+                        html.Div(className = 'col-lg-8', children = [
+                            html.H3("Cliques")
                         ]),
                         html.Div(className = 'col-lg-4', children = [
-                            html.Div(className = 'bar-chart-wp', children = [
-                                cyto.Cytoscape(
-                                    id='cyto-ego-network-3',
-                                    layout={'name': 'cose'},
-                                    style={'width': '100%', 'height': '20vh'},
-                                    elements = []
-                                ),
-                                html.P(id='cyto-ego-network-3-mouseoverNodeData-output')
+                            dcc.Slider(
+                                id = 'nclique_filter',
+                                min = 0,
+                                max = 3,
+                                marks = helpers.generate_range_values(helpers.clique_sizes()),
+                                value = 1
+                            )
+                        ])
+                    ]),
+                    html.Div(className = 'bar-chart-wp', children = [
+                        cyto.Cytoscape(
+                            id='cyto-clique-network',
+                            layout={'name': 'cose'},
+                            style={'width': '100%', 'height': '30vh'},
+                            elements = []
+                        ),
+                        html.P(id='cyto-clique-network-mouseoverNodeData-output')
+                    ]),
+                    html.Div(className = 'mg-t-20', children = [
+                        html.H3("Egos"),
+                        html.Div(className = "row", children = [
+                            html.Div(className = 'col-lg-4', children = [
+                                html.Div(className = 'bar-chart-wp', children = [
+                                    cyto.Cytoscape(
+                                        id='cyto-ego-network-1',
+                                        layout={'name': 'cose'},
+                                        style={'width': '100%', 'height': '20vh'},
+                                        elements = []
+                                    ),
+                                    html.P(id='cyto-ego-network-1-mouseoverNodeData-output')
+                                ])
+                            ]),
+                            html.Div(className = 'col-lg-4', children = [
+                                html.Div(className = 'bar-chart-wp', children = [
+                                    cyto.Cytoscape(
+                                        id='cyto-ego-network-2',
+                                        layout={'name': 'cose'},
+                                        style={'width': '100%', 'height': '20vh'},
+                                        elements = []
+                                    ),
+                                    html.P(id='cyto-ego-network-2-mouseoverNodeData-output')
+                                ])
+                            ]),
+                            html.Div(className = 'col-lg-4', children = [
+                                html.Div(className = 'bar-chart-wp', children = [
+                                    cyto.Cytoscape(
+                                        id='cyto-ego-network-3',
+                                        layout={'name': 'cose'},
+                                        style={'width': '100%', 'height': '20vh'},
+                                        elements = []
+                                    ),
+                                    html.P(id='cyto-ego-network-3-mouseoverNodeData-output')
+                                ])
                             ])
                         ])
                     ])
                 ])
             ])
         ])
-    ])
-]
+    ]
+
+@app.callback(
+    Output("cyto-network", "elements"),
+    [Input("genre_filter", "value"),
+    Input("rating_filter", "value"),
+    Input("sales_rank_filter", "value"),
+    Input("reviews_filter", "value"),
+    Input("page_filter", "value"),
+    Input("price_filter", "value"),
+    Input("nodes_filter", "value"),
+    Input("centrality_scope", "value"),
+    Input("layout_engine", "value"),
+    Input("detail_limit", "value"),
+    Input("detail_metric", "value"),
+    Input("expanded_nodes", "data")],
+)
+def update_overall_graph(genre_filter, rating_filter, sales_rank_filter, reviews_filter, page_filter, price_filter, nodes_filter, centrality_scope, layout_engine, detail_limit, detail_metric, expanded_nodes):
+    return charts.plot_cyto_graph(params = locals())
+
+@app.callback(
+    Output("expanded_nodes", "data"),
+    [Input("cyto-network", "tapNodeData")],
+    [State("expanded_nodes", "data"),
+    State("detail_limit", "value")]
+)
+def toggle_expanded_node(node_data, expanded_nodes, detail_limit):
+    # Every node is already drawn without a limit
+    if not node_data or not detail_limit:
+        raise PreventUpdate
+    node = node_data['id']
+    if node in expanded_nodes:
+        return [expanded for expanded in expanded_nodes if expanded != node]
+    return expanded_nodes + [node]
 
 @app.callback(
-    [Output("cyto-network", "elements"),
-    Output("cyto-clique-network", "elements"),
+    [Output("cyto-clique-network", "elements"),
     Output("cyto-ego-network-1", "elements"),
     Output("cyto-ego-network-2", "elements"),
     Output("cyto-ego-network-3", "elements")],
@@ -219,11 +301,12 @@ content = [
     Input("page_filter", "value"),
     Input("price_filter", "value"),
     Input("nclique_filter", "value"),
-    Input("nodes_filter", "value")],
+    Input("nodes_filter", "value"),
+    Input("centrality_scope", "value"),
+    Input("layout_engine", "value")],
 )
-def update_network_graphs(genre_filter, rating_filter, sales_rank_filter, reviews_filter, page_filter, price_filter, nclique_filter, nodes_filter):
+def update_network_graphs(genre_filter, rating_filter, sales_rank_filter, reviews_filter, page_filter, price_filter, nclique_filter, nodes_filter, centrality_scope, layout_engine):
     return [
-        charts.plot_cyto_graph(params = locals()),
         charts.plot_cyto_nclique_graph(params = locals()),
         *charts.plot_cyto_ego_graphs(params = locals())
         ]
@@ -234,10 +317,12 @@ def update_network_graphs(genre_filter, rating_filter, sales_rank_filter, review
     Output("cyto-ego-network-1", "layout"),
     Output("cyto-ego-network-2", "layout"),
     Output("cyto-ego-network-3", "layout")],
-    [Input("chart_type_option", "value")]
+    [Input("chart_type_option", "value"),
+    Input("layout_engine", "value")]
 )
-def update_graph_layout(chart_type_option):
-    layout = {"name" : chart_type_option}
+def update_graph_layout(chart_type_option, layout_engine):
+    # Elements laid out on the server carry their positions
+    layout = {"name" : "preset" if layout_engine == 'server' else chart_type_option}
     return [layout] * 5
 
 @app.callback(